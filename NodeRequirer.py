@@ -7,13 +7,81 @@ import functools
 
 from .src import utils
 from .src.RequireSnippet import RequireSnippet
-from .src.modules import core_modules
-from .src.ModuleLoader import ModuleLoader
-from .src.node_bridge import node_bridge
+from .src.ModuleLoader import ModuleLoader, warm_up
+from .src.node_bridge import get_worker, stop_workers
+from .src import ProjectIndex
+from .src import GitIndex
+from .src import async_tasks
+from .src import ImportIndex
+from .src import core_exports
 
 WORD_SPLIT_RE = re.compile(r"\W+")
-GLOBAL_IMPORT_RE = re.compile(r"^((var|let|const|\s{0,5})\s\w+\s*=\s*)?require\s*\(")
-ESLINT_UNDEF_RE = re.compile(r'"(.*)" is not defined')
+ESLINT_UNDEF_RE = re.compile(r'[\'"](.*)[\'"] is not defined')
+ESLINT_WORKER = os.path.join(os.path.dirname(__file__), 'src', 'eslint_worker.js')
+JS_SELECTOR = 'source.js, source.jsx, source.ts, source.tsx'
+
+# Side bar commands after which the changed paths are patched in the index.
+# Commands prompting for a name (new_folder, rename_path) only change the
+# file system later and are picked up by on_post_save or the polling sweep.
+SIDEBAR_PATH_ARGS = {
+    'delete_file': 'files',
+    'delete_folder': 'dirs'
+}
+
+
+def plugin_loaded():
+    """Start sweeping the project indexes for changes."""
+    ProjectIndex.start_polling()
+
+
+def plugin_unloaded():
+    """Stop sweeping the project indexes and stop the node workers."""
+    ProjectIndex.stop_polling()
+    stop_workers()
+
+
+def update_paths(paths):
+    """Patch the project indexes and git file lists containing paths."""
+    ProjectIndex.update_paths(paths)
+    GitIndex.update_paths(paths)
+
+class ProjectIndexListener(sublime_plugin.EventListener):
+
+    """Warms up the shared project index when JavaScript files are opened."""
+
+    def on_load(self, view):
+        """Called when a file is finished loading."""
+        self.warm_up(view)
+
+    def on_activated(self, view):
+        """Called when a view gains input focus."""
+        self.warm_up(view)
+
+    def warm_up(self, view):
+        """Load the project index for the view on a background thread."""
+        file_name = view.file_name()
+        if file_name and view.match_selector(0, JS_SELECTOR):
+            sublime.set_timeout_async(functools.partial(warm_up, file_name), 0)
+
+    def on_close(self, view):
+        """Drop the parsed imports of a closed view."""
+        ImportIndex.forget(view.id())
+
+    def on_post_save_async(self, view):
+        """Add newly saved files to the index of their project."""
+        file_name = view.file_name()
+        if file_name and file_name.endswith('.sublime-project'):
+            utils.clear_project_prefs()
+        update_paths([file_name])
+
+    def on_post_window_command(self, window, command_name, args):
+        """Patch the index after files were changed from the side bar."""
+        key = SIDEBAR_PATH_ARGS.get(command_name)
+        if key and args and args.get(key):
+            paths = list(args[key])
+            sublime.set_timeout_async(
+                functools.partial(update_paths, paths), 0)
+
 
 class RequireFromWordCommand(sublime_plugin.TextCommand):
 
@@ -29,45 +97,76 @@ class RequireFromWordCommand(sublime_plugin.TextCommand):
                                                        view=self.view)
 
         self.module_loader = ModuleLoader(self.view.file_name())
-        self.files = self.module_loader.get_file_list()
-
-        words = [word_text]
 
+        text = None
         if cursor.empty() and import_undefined_vars:
-            undef_vars = self.find_undefined_vars()
-            if undef_vars:
-                words = undef_vars
+            text = self.view.substr(sublime.Region(0, self.view.size()))
 
+        def find_modules(task):
+            words = [word_text]
+            if text is not None:
+                undef_vars = self.find_undefined_vars(text, task)
+                task.check()
+                if undef_vars:
+                    words = undef_vars
+            return words, self.module_loader.find_modules(words)
+
+        async_tasks.run_async(('require_from_word', self.view.id()),
+                              find_modules, self.insert_modules,
+                              timeout=utils.get_pref('command_timeout'))
+
+    def insert_modules(self, result):
+        """Insert the modules found for the words on the main thread."""
+        words, modules = result
+        picked = []
+        resolved = []
         for word in words:
-            module = utils.best_fuzzy_match(self.files, word)
-            self.view.run_command('require_insert_helper', {
+            module = modules[word]
+            if module is None:
+                sublime.status_message(
+                    'NodeRequirer: no module found for %s' % word)
+                continue
+            picked.append(module)
+            module = self.module_loader.resolve(module)
+            if module not in resolved:
+                resolved.append(module)
+
+        if resolved:
+            self.module_loader.record_usage(picked)
+            self.view.run_command('require_batch_insert_helper', {
                 'args': {
-                    'module': module,
-                    'type': 'word'
+                    'modules': resolved
                 }
             })
 
-    def find_undefined_vars(self):
-        """Executes ESLint if it is installed as local module and finds undefined variables"""
-        eslint_path = os.path.join(self.module_loader.project_folder,
-                                   'node_modules',
-                                   'eslint', 'bin', 'eslint.js')
-        if not os.path.exists(eslint_path):
+    def find_undefined_vars(self, text, task):
+        """Executes ESLint if it is installed as local module and finds undefined variables
+
+        ESLint runs in a long lived node worker per project, so only the
+        first lookup pays for starting node and loading ESLint.
+        """
+        project_folder = self.module_loader.project_folder
+        eslint_path = os.path.join(
+            self.module_loader.get_modules_path('eslint'), 'eslint')
+        if not os.path.exists(os.path.join(eslint_path, 'bin', 'eslint.js')):
             return []
 
-        args = ['-f', 'compact', '--stdin',
-                '--stdin-filename', self.view.file_name()]
+        worker = get_worker(
+            ESLINT_WORKER, [eslint_path, project_folder], cwd=project_folder,
+            idle_timeout=utils.get_pref('eslint_worker_idle_timeout'))
 
         try:
-            text = self.view.substr(sublime.Region(0, self.view.size()))
-            output = node_bridge(text, eslint_path, args)
+            response = worker.request({
+                'text': text,
+                'filename': self.view.file_name()
+            }, timeout=task.remaining(10))
         except Exception as e:
             return []
 
         return list(set([
-            re.search(ESLINT_UNDEF_RE, line).group(1)
-            for line in output.split('\n')
-            if '(no-undef)' in line
+            re.search(ESLINT_UNDEF_RE, message['message']).group(1)
+            for message in response.get('messages', [])
+            if message.get('ruleId') == 'no-undef'
         ]))
 
 
@@ -81,20 +180,33 @@ class RequireCommand(sublime_plugin.TextCommand):
 
         # Simple Require Command
         if command is 'simple':
-            # Must copy the core modules so modifying self.files
-            # does not change the core_modules list
-            self.files = list(core_modules)
             func = self.insert
         # Export Command
         else:
-            self.files = []
             self.exports = ['------ Select One or More Options ------']
             self.selected_exports = []
             func = self.show_exports
+        self.files = []
 
-        self.module_loader = ModuleLoader(self.view.file_name())
-        self.files += self.module_loader.get_file_list()
+        lazy_dependencies = utils.get_project_pref('lazy_dependencies',
+                                                   view=self.view)
 
+        self.module_loader = ModuleLoader(self.view.file_name())
+        # Loading the core modules of the installed node may run node
+        self.run_async(
+            lambda task: self.module_loader.rank_modules(
+                list(core_exports.get_core_modules()) +
+                self.module_loader.get_file_list(lazy_dependencies)),
+            functools.partial(self.show_files, func))
+
+    def run_async(self, func, on_done):
+        """Run func off the main thread, superseding earlier calls."""
+        async_tasks.run_async(('require', self.view.id()), func, on_done,
+                              timeout=utils.get_pref('command_timeout'))
+
+    def show_files(self, func, files):
+        """Prompt selection of a module once the ranked list is loaded."""
+        self.files = files
         sublime.active_window().show_quick_panel(
             self.files, self.on_done_call_func(self.files, func))
 
@@ -105,6 +217,7 @@ class RequireCommand(sublime_plugin.TextCommand):
                 'path': path
             }]
         })
+        utils.clear_project_prefs()
 
     def on_path_changed(self, text):
         """Do nothing when path is changed."""
@@ -121,11 +234,27 @@ class RequireCommand(sublime_plugin.TextCommand):
     def on_done_call_func(self, choices, func):
         """Return a function which is used with sublime list picking."""
         def on_done(index):
-            if index >= 0:
-                return func(choices[index])
+            if index < 0:
+                return
+            if self.module_loader.is_browse_entry(choices[index]):
+                return self.show_dependency_files(choices[index], func)
+            self.module_loader.record_usage([choices[index]])
+            return func(self.module_loader.resolve(choices[index]))
 
         return on_done
 
+    def show_dependency_files(self, entry, func):
+        """Prompt selection of a file inside the chosen dependency."""
+        def show(files):
+            sublime.set_timeout(
+                lambda: sublime.active_window().show_quick_panel(
+                    files,
+                    self.on_done_call_func(files, func)), 10
+            )
+
+        self.run_async(
+            lambda task: self.module_loader.get_browse_list(entry), show)
+
     def insert(self, module):
         """Run the insert helper command with the module selected."""
         self.view.run_command('require_insert_helper', {
@@ -139,13 +268,21 @@ class RequireCommand(sublime_plugin.TextCommand):
         """Prompt selection of exports for previously selected file."""
         if module is not None:
             self.selected_module = module
-            self.exports += self.module_loader.get_exports(module)
+            return self.run_async(
+                lambda task: self.module_loader.get_exports(module),
+                self.add_exports)
         sublime.set_timeout(
             lambda: sublime.active_window().show_quick_panel(
                 self.exports,
                 self.on_export_done), 10
         )
 
+    def add_exports(self, exports):
+        """Prompt selection of the exports once they are parsed."""
+        if exports:
+            self.exports += exports
+            self.show_exports()
+
     def on_export_done(self, index):
         """Handle selection of exports."""
         if index > 0:
@@ -231,10 +368,14 @@ class RequireInsertHelperCommand(sublime_plugin.TextCommand):
         self.edit = edit
 
         is_from_word = (args['type'] == 'word')
-        module_info = get_module_info(args['module'], self.view)
-        module_path = module_info['module_path']
-        module_name = module_info['module_name']
+        snippet = self.get_snippet(args['module'], self.get_snippet_context())
+        if is_from_word:
+            self.run_from_word(snippet)
+        else:
+            self.run_from_command(snippet)
 
+    def get_snippet_context(self):
+        """Return the RequireSnippet options implied by the cursor position."""
         view = self.view
 
         cursor = view.sel()[0]
@@ -252,20 +393,22 @@ class RequireInsertHelperCommand(sublime_plugin.TextCommand):
                                not in_brackets)
         context_allows_semicolon = (not next_text.startswith((';', ',')) and
                                     not in_brackets)
-
-        snippet = RequireSnippet(
-            module_name,
-            module_path,
-            should_add_var_name=should_add_var_name,
-            should_add_var_statement=should_add_var_statement,
-            context_allows_semicolon=context_allows_semicolon,
-            view=view,
-            file_name=view.file_name()
+        return {
+            'should_add_var_name': should_add_var_name,
+            'should_add_var_statement': should_add_var_statement,
+            'context_allows_semicolon': context_allows_semicolon
+        }
+
+    def get_snippet(self, module, context):
+        """Return the RequireSnippet for module."""
+        module_info = get_module_info(module, self.view)
+        return RequireSnippet(
+            module_info['module_name'],
+            module_info['module_path'],
+            view=self.view,
+            file_name=self.view.file_name(),
+            **context
         )
-        if is_from_word:
-            self.run_from_word(snippet)
-        else:
-            self.run_from_command(snippet)
 
     def run_from_word(self, snippet):
         """Insert a require statement from the ctrl+shift+o command.
@@ -276,37 +419,22 @@ class RequireInsertHelperCommand(sublime_plugin.TextCommand):
         at the bottom of the import list, rather than at the current
         cursor position.
         """
-
-        cursor = self.view.sel()[0]
-        prev_region = sublime.Region(0, cursor.begin())
-        lines = self.view.lines(prev_region)
-        region_for_insertion = None
-        found_imports = False
-        for line in lines:
-            line_text = self.view.substr(line)
-
-            is_global_import = (
-                line_text.startswith("import") or
-                re.match(GLOBAL_IMPORT_RE, line_text)
-            )
-
-            if not is_global_import:
-                if found_imports:
-                    region_for_insertion = line
-                    break
-            else:
-                found_imports = True
-
-        if region_for_insertion is None:
-            region_for_insertion = self.view.line(cursor.begin())
-
         formatted_code = snippet.get_formatted_code() + '\n'
         self.view.insert(
             self.edit,
-            region_for_insertion.begin(),
+            self.get_import_insertion_point(),
             formatted_code
         )
 
+    def get_import_insertion_point(self):
+        """Return the point after the import list, before the cursor."""
+        cursor = self.view.sel()[0]
+        point = ImportIndex.get_import_index(self.view).get_insertion_point(
+            cursor.begin())
+        if point is None:
+            point = self.view.line(cursor.begin()).begin()
+        return point
+
     def run_from_command(self, snippet):
         """Run the standard insert snippet command at the cursor position."""
         self.view.run_command('insert_snippet', snippet.get_args())
@@ -325,6 +453,43 @@ class RequireInsertHelperCommand(sublime_plugin.TextCommand):
         return last_bracket
 
 
+class RequireBatchInsertHelperCommand(RequireInsertHelperCommand):
+
+    """Command for inserting the require statements of several modules.
+
+    The statements go below the import list in a single edit, so the import
+    list is located once and the whole batch is undone in one step.
+    """
+
+    def run(self, edit, args):
+        """Insert the require statements of args['modules']."""
+        self.edit = edit
+        context = self.get_snippet_context()
+
+        statements = []
+        seen = set()
+        imports = ImportIndex.get_import_index(self.view)
+        for module in args['modules']:
+            snippet = self.get_snippet(module, context)
+            if imports.is_imported(snippet.path, snippet.name):
+                sublime.status_message(
+                    'NodeRequirer: %s is already imported' % snippet.path)
+                continue
+            code = snippet.get_formatted_code()
+            if code not in seen:
+                seen.add(code)
+                statements.append((snippet.path, code))
+
+        if not statements:
+            return
+        if utils.get_project_pref('sort_imports', view=self.view):
+            statements.sort(key=lambda s: s[0].lower())
+
+        formatted_code = '\n'.join(code for path, code in statements) + '\n'
+        self.view.insert(edit, self.get_import_insertion_point(),
+                         formatted_code)
+
+
 def get_module_info(module_path, view):
     """Get a dictionary with keys for the module_path and the module_name.
 
@@ -337,7 +502,7 @@ def get_module_info(module_path, view):
     if aliased_to:
         module_name = aliased_to
     else:
-        module_name = os.path.basename(module_path)
+        module_name = os.path.basename(utils.strip_node_scheme(module_path))
         module_name, extension = utils.splitext(module_name)
 
         # When requiring an index.js file, rename the
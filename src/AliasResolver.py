@@ -0,0 +1,85 @@
+"""This file contains the AliasResolver class."""
+import os
+import re
+
+# Back references and conditionals refer to groups by number, which change
+# once the patterns are combined
+GROUP_REFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+
+class AliasResolver():
+
+    """Resolves the variable name a module is aliased to.
+
+    Built once from the alias and alias-pattern preferences: explicit
+    aliases are a dict lookup and all patterns are compiled into a single
+    expression, so a path is only matched once to find the first pattern
+    matching it.
+    """
+
+    def __init__(self, aliases, alias_patterns):
+        """Constructor for AliasResolver."""
+        self.aliases = dict(aliases or {})
+        self.patterns = []
+        for pattern, result in (alias_patterns or {}).items():
+            try:
+                self.patterns.append((re.compile(pattern), result))
+            except re.error:
+                continue
+        self.combined = self.compile_combined()
+
+    def compile_combined(self):
+        """Compile the patterns into one named alternative each.
+
+        Returns None when they can't be combined, e.g. with back references
+        or inline flags, in which case they are tried one by one.
+        """
+        if not self.patterns:
+            return None
+        if any(GROUP_REFERENCE_RE.search(compiled.pattern)
+               for compiled, result in self.patterns):
+            return None
+        alternatives = ['(?P<_alias%d>(?:%s))' % (i, compiled.pattern)
+                        for i, (compiled, result) in enumerate(self.patterns)]
+        try:
+            return re.compile('|'.join(alternatives))
+        except re.error:
+            return None
+
+    def resolve(self, module_path):
+        """Return the alias of module_path, or None."""
+        # Resolve explicit aliases
+        if module_path in self.aliases:
+            return self.aliases[module_path]
+
+        # Resolve regular expression aliases
+        for compiled, result in self.get_candidates(module_path):
+            m = compiled.match(module_path)
+            if m:
+                return m.expand(result)
+
+        # Allow the alias for package.json in any location to be defined by a
+        # "package.json" alias
+        if os.path.basename(module_path) == 'package.json':
+            if 'package.json' in self.aliases:
+                return self.aliases['package.json']
+
+        return None
+
+    def resolve_many(self, module_paths):
+        """Return a dict of module path => alias or None."""
+        return dict((path, self.resolve(path)) for path in module_paths)
+
+    def get_candidates(self, module_path):
+        """Return the (pattern, result) pairs worth matching module_path to.
+
+        The combined expression tells which pattern matches first, its own
+        compiled pattern is then used to expand the result with the right
+        group numbers.
+        """
+        if self.combined is None:
+            return self.patterns
+        m = self.combined.match(module_path)
+        if m is None:
+            return ()
+        return (self.patterns[int(m.lastgroup[len('_alias'):])],)
@@ -0,0 +1,196 @@
+"""This file contains the ExportIndex class."""
+import os
+import re
+import json
+import mmap
+import threading
+from collections import OrderedDict
+
+QUOTED = rb"""['"]([^'"]+)['"]"""
+
+# Matches, in order of the groups:
+#   exports.name =
+#   export const name
+#   export * as name from 'module' / export * from 'module'
+#   export { a, b as c } / export { a, b as c } from 'module'
+#   module.exports = require('module')
+EXPORT_RE = re.compile(
+    rb"exports\.(.*?)="
+    rb"|export\s+(?:var|let|const|function|class)?\s+([^()\[\]{},/*<>%\s-]+)"
+    rb"|export\s*\*\s*(?:as\s+(\w+)\s*)?from\s*" + QUOTED +
+    rb"|export\s*\{([^}]*)\}(?:\s*from\s*" + QUOTED + rb")?"
+    rb"|module\.exports\s*=\s*require\s*\(\s*" + QUOTED + rb"\s*\)"
+)
+AS_RE = re.compile(r"\s+as\s+")
+
+# Extensions tried, in order, when resolving a module specifier
+RESOLVE_EXTENSIONS = ('', '.js', '.mjs', '.cjs', '.jsx', '.ts', '.tsx')
+
+# Files at least this large are scanned through a memory map
+MMAP_THRESHOLD = 1024 * 1024
+CACHE_SIZE = 2048
+
+
+class ExportIndex():
+
+    """LRU cache of the exports found in files.
+
+    For every file the index stores the names it exports itself and the
+    modules it re-exports everything from. Entries are keyed by path, mtime
+    and size, so a file is only scanned again after it changed, and files
+    re-exported by several barrel files are only scanned once.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        """Constructor for ExportIndex."""
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_exports(self, path):
+        """Return the list of exports of the file at path.
+
+        Modules the file re-exports from are followed, each file is visited
+        at most once so import cycles terminate.
+        """
+        exports = []
+        seen = set()
+        visited = set()
+        pending = [path]
+        while pending:
+            file_path = pending.pop()
+            if file_path in visited:
+                continue
+            visited.add(file_path)
+
+            names, sources = self.get_entry(file_path)
+            for name in names:
+                if name not in seen:
+                    seen.add(name)
+                    exports.append(name)
+
+            dirname = os.path.dirname(file_path)
+            resolved = [resolve_module(s, dirname) for s in sources]
+            pending.extend(p for p in reversed(resolved) if p)
+        return exports
+
+    def get_entry(self, path):
+        """Return the (names, sources) a file exports directly."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return (), ()
+
+        key = (path, stat.st_mtime, stat.st_size)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.entries[key] = entry
+                return entry
+
+        entry = scan_exports(path, stat.st_size)
+        with self.lock:
+            self.entries[key] = entry
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return entry
+
+
+def scan_exports(path, size):
+    """Find the exports in a file with a single pass of EXPORT_RE."""
+    try:
+        with open(path, 'rb') as f:
+            if size >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                    return find_exports(buf)
+            return find_exports(f.read())
+    except (IOError, OSError, ValueError):
+        return (), ()
+
+
+def find_exports(buf):
+    """Return the export names and re-exported modules in a buffer."""
+    names = []
+    sources = []
+    for match in EXPORT_RE.finditer(buf):
+        (commonjs, es6, star_name, star_source,
+         specifiers, specifiers_source, required) = match.groups()
+
+        if commonjs is not None or es6 is not None:
+            names.append(decode(commonjs or es6))
+        elif star_source is not None:
+            if star_name is not None:
+                names.append(decode(star_name))
+            else:
+                sources.append(decode(star_source))
+        elif specifiers is not None:
+            for specifier in decode(specifiers).split(','):
+                name = AS_RE.split(specifier.strip())[-1]
+                if name and name != 'default':
+                    names.append(name)
+        elif required is not None:
+            sources.append(decode(required))
+    return tuple(names), tuple(sources)
+
+
+def decode(name):
+    return name.decode('utf-8', 'replace').strip()
+
+
+def resolve_module(specifier, dirname):
+    """Resolve a module specifier the way node does, or return None."""
+    if specifier.startswith(('./', '../')) or specifier in ('.', '..'):
+        return resolve_path(os.path.join(dirname, specifier))
+
+    while True:
+        path = os.path.join(dirname, 'node_modules', specifier)
+        if os.path.exists(path):
+            return resolve_path(path)
+        parent = os.path.dirname(dirname)
+        if parent == dirname:
+            return None
+        dirname = parent
+
+
+def resolve_path(path):
+    """Resolve a file or folder to the file node would load for it."""
+    path = os.path.normpath(path)
+    for extension in RESOLVE_EXTENSIONS:
+        if os.path.isfile(path + extension):
+            return path + extension
+
+    if not os.path.isdir(path):
+        return None
+
+    main = get_package_main(path)
+    if main:
+        main_path = os.path.normpath(os.path.join(path, main))
+        if main_path != path:
+            resolved = resolve_path(main_path)
+            if resolved:
+                return resolved
+
+    for extension in RESOLVE_EXTENSIONS[1:]:
+        index = os.path.join(path, 'index' + extension)
+        if os.path.isfile(index):
+            return index
+    return None
+
+
+def get_package_main(path):
+    """Return the main field of the package.json in path, if any."""
+    try:
+        with open(os.path.join(path, 'package.json'), 'r',
+                  encoding='UTF-8') as f:
+            main = json.load(f).get('main')
+    except (IOError, OSError, ValueError, AttributeError):
+        return None
+    return main if isinstance(main, str) else None
+
+
+_index = ExportIndex()
+
+
+def get_exports(path):
+    """Return the exports of the file at path from the shared index."""
+    return _index.get_exports(path)
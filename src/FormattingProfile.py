@@ -0,0 +1,345 @@
+"""This file contains the FormattingProfile class."""
+import os
+import re
+import json
+import threading
+
+from . import markers
+
+JSCS_FILES = ('.jscsrc', '.jscs.json')
+# In order of precedence when a folder has several of them
+ESLINT_FILES = ('.eslintrc.json', '.eslintrc.yaml', '.eslintrc.yml',
+                '.eslintrc')
+PRETTIER_FILES = ('.prettierrc', '.prettierrc.json', '.prettierrc.yaml',
+                  '.prettierrc.yml')
+CONFIG_FILES = frozenset(JSCS_FILES + ESLINT_FILES + PRETTIER_FILES +
+                         ('package.json',))
+markers.register(CONFIG_FILES)
+
+ESLINT_QUOTES = {'single': "'", 'double': '"'}
+ESLINT_OFF = (0, 'off')
+
+# Matches json strings, which are kept, and comments, which are removed
+JSON_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\])*")|//[^\n]*|/\*.*?\*/',
+                             re.DOTALL)
+
+CACHE_SIZE = 256
+
+# folder -> (stamped paths, stamps, profile)
+_profiles = {}
+_lock = threading.Lock()
+
+
+class FormattingProfile():
+
+    """Formatting a project's jscs, ESLint and prettier configs ask for.
+
+    quotes is the quote character to use and semicolons whether statements
+    end with one, both are None when no config has an opinion. strip_before
+    and strip_after tell whether the spaces around = must be removed.
+    """
+
+    def __init__(self, quotes=None, semicolons=None,
+                 strip_before=False, strip_after=False):
+        """Constructor for FormattingProfile."""
+        self.quotes = quotes
+        self.semicolons = semicolons
+        self.strip_before = strip_before
+        self.strip_after = strip_after
+
+
+def get_profile(file_name):
+    """Return the FormattingProfile for the folder of file_name.
+
+    Profiles are cached per folder. A cached profile is reused as long as
+    the mtimes of the folders up to the root and of the config files it was
+    built from are unchanged, so adding, editing or removing a config file
+    is picked up without parsing anything otherwise.
+    """
+    dirname = os.path.dirname(os.path.abspath(file_name))
+    with _lock:
+        cached = _profiles.get(dirname)
+    if cached is not None and get_stamps(cached[0]) == cached[1]:
+        return cached[2]
+
+    dirs = get_ancestors(dirname)
+    dir_stamps = get_stamps(dirs)
+    configs = find_configs(dirs)
+    config_paths = [os.path.join(d, name) for d, names in configs
+                    for name in names]
+    stamps = dir_stamps + get_stamps(config_paths)
+    profile = build_profile(configs)
+
+    with _lock:
+        if len(_profiles) >= CACHE_SIZE:
+            _profiles.clear()
+        _profiles[dirname] = (dirs + config_paths, stamps, profile)
+    return profile
+
+
+def get_ancestors(dirname):
+    """Return dirname and its parent folders, nearest first."""
+    dirs = [dirname]
+    while os.path.dirname(dirname) != dirname:
+        dirname = os.path.dirname(dirname)
+        dirs.append(dirname)
+    return dirs
+
+
+def get_stamps(paths):
+    stamps = []
+    for path in paths:
+        try:
+            stamps.append(os.stat(path).st_mtime)
+        except OSError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+def find_configs(dirs):
+    """Return (folder, config file names) pairs, nearest folder first.
+
+    Uses the folder listings cached by markers instead of testing for every
+    config file.
+    """
+    configs = []
+    for dirname in dirs:
+        names = CONFIG_FILES.intersection(markers.get_markers(dirname))
+        if names:
+            configs.append((dirname, names))
+    return configs
+
+
+def build_profile(configs):
+    """Merge the formatting options of all tools into a profile."""
+    jscs = get_jscs_options(configs)
+    eslint = get_eslint_rules(configs)
+    prettier = get_prettier_options(configs)
+
+    jscs_quotes = jscs.get('validateQuoteMarks')
+    if isinstance(jscs_quotes, dict):
+        jscs_quotes = jscs_quotes.get('mark')
+    if jscs_quotes is True:
+        # Ignore the 'true' autodetection setting
+        jscs_quotes = None
+
+    quotes = first_set(
+        get_prettier_quotes(prettier),
+        get_eslint_quotes(eslint.get('quotes')),
+        jscs_quotes)
+    semicolons = first_set(
+        prettier.get('semi') if prettier else None,
+        get_eslint_semicolons(eslint.get('semi')),
+        False if jscs.get('disallowSemicolons') else None)
+
+    # Prettier and ESLint's space-infix-ops always want spaces around =
+    spaced = prettier is not None or is_eslint_rule_on(
+        eslint.get('space-infix-ops'))
+    return FormattingProfile(
+        quotes=quotes,
+        semicolons=semicolons,
+        strip_before=not spaced and parse_jscs_spacing(
+            jscs.get('disallowSpaceBeforeBinaryOperators')),
+        strip_after=not spaced and parse_jscs_spacing(
+            jscs.get('disallowSpaceAfterBinaryOperators')))
+
+
+def first_set(*values):
+    for value in values:
+        if value is not None:
+            return value
+    return None
+
+
+def get_jscs_options(configs):
+    """Merge the nearest .jscsrc, .jscs.json and package.json jscsConfig."""
+    option_sets = []
+    for name in JSCS_FILES + ('package.json',):
+        for dirname, names in configs:
+            if name in names:
+                options = read_config(os.path.join(dirname, name))
+                if name == 'package.json':
+                    options = options.get('jscsConfig')
+                if isinstance(options, dict):
+                    option_sets.append((dirname, options))
+                break
+
+    # Options of nearer folders take precedence
+    option_sets.sort(key=lambda x: len(x[0]))
+    options = dict()
+    for dirname, option_set in option_sets:
+        options.update(option_set)
+    return options
+
+
+def get_eslint_rules(configs):
+    """Merge the rules of the cascading ESLint configs.
+
+    In every folder an .eslintrc file takes precedence over eslintConfig in
+    package.json. Parent folders are not consulted past a config with
+    "root": true.
+    """
+    rule_sets = []
+    for dirname, names in configs:
+        config = None
+        for name in ESLINT_FILES:
+            if name in names:
+                config = read_config(os.path.join(dirname, name))
+                break
+        else:
+            if 'package.json' in names:
+                package = read_config(os.path.join(dirname, 'package.json'))
+                config = package.get('eslintConfig')
+
+        if not isinstance(config, dict):
+            continue
+        rules = config.get('rules')
+        if isinstance(rules, dict):
+            rule_sets.append(rules)
+        if config.get('root') is True:
+            break
+
+    rules = dict()
+    for rule_set in reversed(rule_sets):
+        rules.update(rule_set)
+    return rules
+
+
+def get_prettier_options(configs):
+    """Return the options of the nearest prettier config, or None."""
+    for dirname, names in configs:
+        # Like prettier, prefer the key in package.json to the rc files
+        if 'package.json' in names:
+            package = read_config(os.path.join(dirname, 'package.json'))
+            if isinstance(package.get('prettier'), dict):
+                return package['prettier']
+
+        for name in PRETTIER_FILES:
+            if name in names:
+                options = read_config(os.path.join(dirname, name))
+                return options if isinstance(options, dict) else {}
+    return None
+
+
+def get_prettier_quotes(options):
+    if not options or 'singleQuote' not in options:
+        return None
+    return "'" if options['singleQuote'] else '"'
+
+
+def is_eslint_rule_on(rule):
+    if rule is None:
+        return False
+    severity = rule[0] if isinstance(rule, list) and rule else rule
+    return severity not in ESLINT_OFF
+
+
+def get_eslint_option(rule, default):
+    if isinstance(rule, list) and len(rule) > 1:
+        return rule[1]
+    return default
+
+
+def get_eslint_quotes(rule):
+    if not is_eslint_rule_on(rule):
+        return None
+    return ESLINT_QUOTES.get(get_eslint_option(rule, 'double'))
+
+
+def get_eslint_semicolons(rule):
+    if not is_eslint_rule_on(rule):
+        return None
+    return get_eslint_option(rule, 'always') != 'never'
+
+
+def parse_jscs_spacing(val):
+    """Check if a disallowSpace{After,Before}BinaryOperators option
+    disallows spaces around `=`.
+    """
+    if type(val) == bool:
+        return val
+
+    if isinstance(val, list) and '=' in val:
+        return True
+
+    return False
+
+
+def read_config(path):
+    """Read a json or YAML config file, returning {} when it's invalid."""
+    try:
+        with open(path, 'r', encoding='UTF-8') as f:
+            text = f.read()
+    except (IOError, OSError, UnicodeDecodeError):
+        return {}
+
+    config = None
+    if not path.endswith(('.yaml', '.yml')):
+        try:
+            config = json.loads(JSON_COMMENT_RE.sub(r'\1', text))
+        except ValueError:
+            if path.endswith('.json'):
+                return {}
+    if config is None:
+        config = parse_yaml(text)
+    return config if isinstance(config, dict) else {}
+
+
+def parse_yaml(text):
+    """Parse the subset of YAML used by linter configs.
+
+    Supports nested mappings, scalars, flow lists like [error, single] and
+    block lists of scalars, which is all the options we read need.
+    """
+    root = {}
+    stack = [(-1, root)]
+    pending = None
+    for line in text.splitlines():
+        content = re.sub(r'(^|\s)#.*$', '', line).rstrip()
+        if not content.strip() or content.strip() == '---':
+            continue
+        indent = len(content) - len(content.lstrip())
+        content = content.strip()
+
+        if pending is not None:
+            parent, key, key_indent = pending
+            pending = None
+            if indent > key_indent:
+                parent[key] = [] if content.startswith('-') else {}
+                stack.append((key_indent, parent[key]))
+
+        while len(stack) > 1 and indent <= stack[-1][0]:
+            stack.pop()
+        container = stack[-1][1]
+
+        if content.startswith('-'):
+            if isinstance(container, list):
+                container.append(parse_yaml_scalar(content[1:].strip()))
+            continue
+
+        key, sep, value = content.partition(':')
+        if not sep or not isinstance(container, dict):
+            continue
+        key = parse_yaml_scalar(key.strip())
+        value = value.strip()
+        if value:
+            container[key] = parse_yaml_scalar(value)
+        else:
+            container[key] = None
+            pending = (container, key, indent)
+    return root
+
+
+def parse_yaml_scalar(value):
+    if value.startswith('[') and value.endswith(']'):
+        items = value[1:-1].strip()
+        return [parse_yaml_scalar(v.strip())
+                for v in items.split(',')] if items else []
+    if len(value) > 1 and value[0] == value[-1] and value[0] in '\'"':
+        return value[1:-1]
+    if value in ('true', 'false'):
+        return value == 'true'
+    try:
+        return int(value)
+    except ValueError:
+        return value
@@ -0,0 +1,189 @@
+"""This file contains the FuzzyMatcher class."""
+import os
+import re
+import heapq
+import threading
+from difflib import SequenceMatcher
+
+NGRAM_SIZE = 3
+# Number of candidates sharing the most n-grams with a word which are scored
+SHORTLIST_SIZE = 64
+NORMALIZE_RE = re.compile(r"[\W_]+")
+
+# Scores of a word matching a module name exactly or as a substring,
+# on top of the similarity ratio
+EXACT_SCORE = 2
+SUBSTRING_SCORE = 1
+
+# Number of best matches a rank function chooses from, and the weight of
+# its score, low enough to only decide between close matches
+RANK_CANDIDATES = 10
+RANK_WEIGHT = 0.5
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_matcher(key, candidates):
+    """Return a shared FuzzyMatcher for candidates.
+
+    The matcher stored under key is reused as long as it was built for an
+    equal list of candidates.
+    """
+    with _matchers_lock:
+        matcher = _matchers.get(key)
+        if matcher is None or matcher.candidates != candidates:
+            matcher = FuzzyMatcher(candidates)
+            _matchers[key] = matcher
+        return matcher
+
+
+def normalize(name):
+    """Lowercase name and strip separators, e.g. some-thing => something."""
+    return NORMALIZE_RE.sub('', name).lower()
+
+
+def get_module_name(path):
+    """Return the name a module would be required as.
+
+    This is the file name without extensions, or the name of its folder for
+    index files.
+    """
+    path = path.rstrip('/' + os.sep)
+    name = os.path.basename(path).split(os.extsep)[0]
+    if name == 'index':
+        parent = os.path.basename(os.path.dirname(path))
+        if parent:
+            name = parent
+    return normalize(name)
+
+
+def get_ngrams(text):
+    """Return the set of n-grams of text."""
+    return set(text[i:i + NGRAM_SIZE]
+               for i in range(len(text) - NGRAM_SIZE + 1))
+
+
+class FuzzyMatcher():
+
+    """Matches words against a list of module paths.
+
+    The module names are indexed by their n-grams once. Looking up a word
+    only scores the short list of candidates sharing the most n-grams with
+    it, instead of comparing the word to every candidate.
+    """
+
+    def __init__(self, candidates):
+        """Constructor for FuzzyMatcher."""
+        self.candidates = list(candidates)
+        self.names = [get_module_name(c) for c in self.candidates]
+        self.exact = {}
+        self.ngrams = {}
+        for i, name in enumerate(self.names):
+            self.exact.setdefault(name, []).append(i)
+            for ngram in get_ngrams(name):
+                self.ngrams.setdefault(ngram, []).append(i)
+
+    def match(self, word, limit=10):
+        """Return up to limit (score, candidate) pairs, best match first.
+
+        Ties are broken by the order of the candidates, so results are
+        deterministic for a given list.
+        """
+        return self.match_many([word], limit)[word]
+
+    def match_many(self, words, limit=10):
+        """Return a dict of word => matches, as returned by match.
+
+        All words are resolved together, the candidates of each n-gram are
+        read once for every word containing it and words too short to be
+        indexed share a single pass over the module names.
+        """
+        queries = dict((word, normalize(word)) for word in words)
+        shortlists = self.get_shortlists(set(queries.values()) - set(['']))
+
+        matches = {}
+        for query, shortlist in shortlists.items():
+            scores = {}
+            for i in self.exact.get(query, ()):
+                scores[i] = EXACT_SCORE + 1.0
+            for i in shortlist:
+                if i not in scores:
+                    scores[i] = self.score(query, self.names[i])
+
+            best = heapq.nsmallest(limit, scores.items(),
+                                   key=lambda item: (-item[1], item[0]))
+            matches[query] = [(score, self.candidates[i])
+                              for i, score in best]
+
+        return dict((word, matches.get(query, []))
+                    for word, query in queries.items())
+
+    def best(self, word, exclude=(), rank=None):
+        """Return the best matching candidate for word, or None.
+
+        Candidates in exclude are never returned. rank is an optional
+        function scoring a candidate between 0 and 1, which is weighted by
+        RANK_WEIGHT and added to the scores of the best matches.
+        """
+        return self.best_many([word], exclude, rank)[word]
+
+    def best_many(self, words, exclude=(), rank=None):
+        """Return a dict of word => best matching candidate or None."""
+        results = {}
+        limit = len(exclude) + (RANK_CANDIDATES if rank else 1)
+        matches = self.match_many(words, limit=limit)
+        for word, word_matches in matches.items():
+            results[word] = None
+            best_score = None
+            for score, candidate in word_matches:
+                if candidate in exclude:
+                    continue
+                if rank is not None:
+                    score += RANK_WEIGHT * rank(candidate)
+                if best_score is None or score > best_score:
+                    results[word] = candidate
+                    best_score = score
+        return results
+
+    def get_shortlists(self, queries):
+        """Return a dict of query => indexes of candidates worth scoring."""
+        shortlists = {}
+        short_queries = [q for q in queries if len(q) < NGRAM_SIZE]
+        for query in short_queries:
+            shortlists[query] = []
+        if short_queries:
+            # Too short to be indexed, these are cheap substring checks
+            for i, name in enumerate(self.names):
+                for query in short_queries:
+                    if query in name:
+                        shortlists[query].append(i)
+            for query in short_queries:
+                del shortlists[query][SHORTLIST_SIZE:]
+
+        queries_by_ngram = {}
+        for query in queries:
+            if len(query) >= NGRAM_SIZE:
+                for ngram in get_ngrams(query):
+                    queries_by_ngram.setdefault(ngram, []).append(query)
+
+        counts = dict((q, {}) for q in queries if len(q) >= NGRAM_SIZE)
+        for ngram, ngram_queries in queries_by_ngram.items():
+            candidates = self.ngrams.get(ngram, ())
+            for query in ngram_queries:
+                query_counts = counts[query]
+                for i in candidates:
+                    query_counts[i] = query_counts.get(i, 0) + 1
+
+        for query, query_counts in counts.items():
+            ranked = heapq.nsmallest(SHORTLIST_SIZE, query_counts.items(),
+                                     key=lambda item: (-item[1], item[0]))
+            shortlists[query] = [i for i, count in ranked]
+        return shortlists
+
+    def score(self, word, name):
+        """Score how well word matches a module name."""
+        ratio = SequenceMatcher(None, word, name).ratio()
+        if word in name:
+            return SUBSTRING_SCORE + ratio
+        return ratio
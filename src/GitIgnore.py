@@ -0,0 +1,213 @@
+"""This file contains the GitIgnore class."""
+import os
+import re
+import threading
+
+from . import markers
+
+GITIGNORE = '.gitignore'
+markers.register((GITIGNORE, '.git'))
+
+# .gitignore path -> (mtime, GitIgnore or None)
+_gitignores = {}
+_lock = threading.Lock()
+
+
+def get_gitignore(path, base=None):
+    """Return the GitIgnore for the file at path, or None.
+
+    Patterns are relative to base, the folder of path by default. Files
+    are compiled once and cached until their mtime changes.
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+
+    with _lock:
+        cached = _gitignores.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    gitignore = None
+    try:
+        with open(path, 'r', encoding='UTF-8', errors='replace') as f:
+            gitignore = GitIgnore(base or os.path.dirname(path), f.read())
+    except (IOError, OSError):
+        pass
+
+    with _lock:
+        _gitignores[path] = (mtime, gitignore)
+    return gitignore
+
+
+def get_parent_gitignores(folder):
+    """Return the GitIgnores of the folders above folder, outermost first.
+
+    These are the .gitignore files between folder and the root of its git
+    repository, and the repository's .git/info/exclude. Returns none when
+    folder is not inside a git repository.
+    """
+    folder = os.path.abspath(folder)
+    dirnames = []
+    for dirname, found in markers.walk_folders(folder):
+        if dirname != folder:
+            dirnames.append((dirname, found))
+        if '.git' in found:
+            break
+    else:
+        return ()
+
+    git_root = dirnames[-1][0] if dirnames else folder
+    gitignores = [get_gitignore(os.path.join(git_root, '.git', 'info',
+                                             'exclude'), git_root)]
+    for dirname, found in reversed(dirnames):
+        if GITIGNORE in found:
+            gitignores.append(get_gitignore(os.path.join(dirname, GITIGNORE)))
+    return tuple(g for g in gitignores if g is not None)
+
+
+def is_ignored(gitignores, path, is_dir):
+    """Check if any of gitignores, outermost first, ignores path.
+
+    Like git, the innermost file with a pattern matching path decides.
+    """
+    for gitignore in reversed(gitignores):
+        ignored = gitignore.match(path, is_dir)
+        if ignored is not None:
+            return ignored
+    return False
+
+
+class GitIgnore():
+
+    """The compiled patterns of a .gitignore file.
+
+    All patterns are compiled into a single expression for files and one
+    for directories, with the last pattern first, so a path is only matched
+    once to find the pattern that applies to it.
+    """
+
+    def __init__(self, base, text):
+        """Constructor for GitIgnore."""
+        self.base = os.path.join(base, '')
+        # (compiled pattern, negated, directories only)
+        self.patterns = []
+        for line in text.splitlines():
+            pattern = parse_pattern(line)
+            if pattern is None:
+                continue
+            try:
+                self.patterns.append((re.compile(pattern[0]),) + pattern[1:])
+            except re.error:
+                continue
+        self.file_patterns = [p for p in self.patterns if not p[2]]
+        self.file_re = compile_combined(self.file_patterns)
+        self.dir_re = compile_combined(self.patterns)
+
+    def match(self, path, is_dir=False):
+        """Return True if path is ignored, False if it is explicitly not.
+
+        Returns None when no pattern matches path.
+        """
+        if not path.startswith(self.base):
+            return None
+        rel_path = path[len(self.base):].replace(os.sep, '/')
+
+        patterns = self.patterns if is_dir else self.file_patterns
+        combined = self.dir_re if is_dir else self.file_re
+        if combined is not None:
+            m = combined.match(rel_path)
+            if m is None:
+                return None
+            index = len(patterns) - 1 - int(m.lastgroup[len('_ignore'):])
+            return not patterns[index][1]
+
+        for compiled, negated, dir_only in reversed(patterns):
+            if compiled.match(rel_path):
+                return not negated
+        return None
+
+
+def compile_combined(patterns):
+    """Compile patterns, last one first, into one named alternative each.
+
+    Returns None when there are none or they can't be combined, e.g. with
+    more groups than the re module supports.
+    """
+    if not patterns:
+        return None
+    alternatives = ['(?P<_ignore%d>%s)' % (i, compiled.pattern)
+                    for i, (compiled, negated, dir_only)
+                    in enumerate(reversed(patterns))]
+    try:
+        return re.compile('|'.join(alternatives))
+    except (re.error, AssertionError):
+        return None
+
+
+def parse_pattern(line):
+    """Return (regular expression, negated, directories only) or None."""
+    if line.startswith('#'):
+        return None
+    line = re.sub(r'(?<!\\)\s+$', '', line)
+    negated = line.startswith('!')
+    if negated:
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    # Patterns with a slash other than at the end are relative to the
+    # .gitignore, others match a name at any depth
+    anchored = '/' in line
+    line = line.lstrip('/')
+    if not line:
+        return None
+
+    prefix = '' if anchored else '(?:.*/)?'
+    return (prefix + translate(line) + r'\Z', negated, dir_only)
+
+
+def translate(pattern):
+    """Translate a gitignore glob into a regular expression."""
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        at_start = i == 0 or pattern[i - 1] == '/'
+        if at_start and pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if at_start and pattern.startswith('**', i) and i + 2 == n:
+            parts.append('.*')
+            i += 2
+            continue
+
+        i += 1
+        if c == '*':
+            parts.append('[^/]*')
+        elif c == '?':
+            parts.append('[^/]')
+        elif c == '\\' and i < n:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+        elif c == '[':
+            j = i
+            if j < n and pattern[j] in '!^':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            while j < n and pattern[j] != ']':
+                j += 1
+            if j >= n:
+                parts.append('\\[')
+                continue
+            chars = pattern[i:j].replace('\\', '\\\\')
+            if chars[0] in '!^':
+                chars = '^' + chars[1:]
+            parts.append('[%s]' % chars)
+            i = j + 1
+        else:
+            parts.append(re.escape(c))
+    return ''.join(parts)
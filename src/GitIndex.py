@@ -0,0 +1,248 @@
+"""This file contains the GitIndex class."""
+import os
+import struct
+import subprocess
+import threading
+
+from . import markers
+from .node_bridge import popen_options
+
+# Number of seconds after which listing the untracked files is given up
+GIT_TIMEOUT = 10
+
+# Index entry modes of regular files and symbolic links, submodules and
+# the directories of a sparse index are left out
+FILE_MODES = (0o100000, 0o120000)
+EXTENDED_FLAG = 0x4000
+SKIP_WORKTREE_FLAG = 0x4000
+
+# work tree -> GitIndex
+_git_indexes = {}
+_lock = threading.Lock()
+
+
+def get_git_index(folder):
+    """Return the shared GitIndex of the repository folder is in, or None.
+
+    folder itself may be the root of the work tree.
+    """
+    markers.register(('.git',))
+    work_tree = None
+    for dirname, found in markers.walk_folders(folder):
+        if '.git' in found:
+            work_tree = dirname
+            break
+    if work_tree is None:
+        return None
+
+    with _lock:
+        git_index = _git_indexes.get(work_tree)
+    if git_index is not None:
+        return git_index
+
+    git_dir = get_git_dir(work_tree)
+    if git_dir is None:
+        return None
+    with _lock:
+        return _git_indexes.setdefault(work_tree, GitIndex(work_tree, git_dir))
+
+
+def get_git_dir(work_tree):
+    """Return the git directory of work_tree, following a .git file."""
+    path = os.path.join(work_tree, '.git')
+    if os.path.isdir(path):
+        return path
+
+    try:
+        with open(path, 'r', encoding='UTF-8') as f:
+            content = f.read().strip()
+    except (IOError, OSError, UnicodeDecodeError):
+        return None
+    if not content.startswith('gitdir:'):
+        return None
+    return os.path.join(work_tree, content[len('gitdir:'):].strip())
+
+
+def update_paths(paths):
+    """Have the untracked files listed again after new files were saved."""
+    with _lock:
+        git_indexes = list(_git_indexes.values())
+
+    for git_index in git_indexes:
+        git_index.update_paths(paths)
+
+
+class GitIndex():
+
+    """The files of a git work tree, read from its index.
+
+    Tracked files are read from the index file in a single read, and only
+    read again when its mtime changes. Untracked files which are not
+    ignored are listed by git, again when the index changed or files were
+    saved which it didn't list.
+    """
+
+    def __init__(self, work_tree, git_dir):
+        """Constructor for GitIndex."""
+        self.work_tree = work_tree
+        self.index_file = os.path.join(git_dir, 'index')
+        self.stamp = None
+        self.tracked = None
+        self.untracked = []
+        self.known = frozenset()
+        self.stale = True
+        # Incremented whenever tracked or untracked changed
+        self.generation = 0
+        # (rel_root, extensions, prune) -> (generation, files)
+        self.lists = {}
+        self.lock = threading.Lock()
+
+    def get_files(self, rel_root, extensions, prune=()):
+        """Return the files below rel_root, relative to rel_root.
+
+        Like the project index, only files with one of extensions are kept,
+        hidden files are skipped and so are directories named in prune at
+        every level. Returns None when the index can't be read. The returned
+        list is shared until the files change and must not be changed.
+        """
+        with self.lock:
+            self.refresh()
+            if self.tracked is None:
+                return None
+
+            key = (rel_root, tuple(extensions), frozenset(prune))
+            cached = self.lists.get(key)
+            if cached is not None and cached[0] == self.generation:
+                return cached[1]
+            files = self.filter(rel_root, tuple(extensions), key[2])
+            self.lists[key] = (self.generation, files)
+            return files
+
+    def refresh(self):
+        """Read the index again if it changed, and the untracked files."""
+        try:
+            stat = os.stat(self.index_file)
+            stamp = (stat.st_mtime, stat.st_size)
+        except OSError:
+            stamp = None
+
+        if stamp != self.stamp:
+            self.stamp = stamp
+            self.tracked = read_index(self.index_file) if stamp else None
+            self.stale = True
+            self.generation += 1
+
+        if self.stale and self.tracked is not None:
+            self.stale = False
+            untracked = list_untracked(self.work_tree)
+            if untracked != self.untracked:
+                self.untracked = untracked
+                self.generation += 1
+            self.known = frozenset(self.tracked + self.untracked)
+
+    def filter(self, rel_root, extensions, prune):
+        prefix = ''
+        if rel_root:
+            prefix = rel_root.replace(os.sep, '/') + '/'
+        files = []
+        for path in self.tracked + self.untracked:
+            if not path.startswith(prefix) or not path.endswith(extensions):
+                continue
+            parts = path[len(prefix):].split('/')
+            if parts[-1].startswith('.') or prune.intersection(parts[:-1]):
+                continue
+            files.append(os.path.join(*parts))
+        return files
+
+    def update_paths(self, paths):
+        """Mark the untracked files stale if paths are new or deleted."""
+        root = os.path.join(self.work_tree, '')
+        for path in paths:
+            if not path or not path.startswith(root):
+                continue
+            rel_path = path[len(root):].replace(os.sep, '/')
+            if rel_path not in self.known or not os.path.exists(path):
+                self.stale = True
+                return
+
+
+def read_index(path):
+    """Return the paths of the files in a git index, None if unreadable.
+
+    Supports the index versions 2 to 4. Files excluded from a sparse
+    checkout and the other stages of conflicting files are left out.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != b'DIRC':
+            return None
+        version, count = struct.unpack_from('>II', data, 4)
+        if version not in (2, 3, 4):
+            return None
+
+        paths = []
+        pos = 12
+        name = b''
+        for _ in range(count):
+            start = pos
+            mode, = struct.unpack_from('>I', data, pos + 24)
+            flags, = struct.unpack_from('>H', data, pos + 60)
+            pos += 62
+            skip_worktree = False
+            if version >= 3 and flags & EXTENDED_FLAG:
+                extended_flags, = struct.unpack_from('>H', data, pos)
+                skip_worktree = bool(extended_flags & SKIP_WORKTREE_FLAG)
+                pos += 2
+
+            if version == 4:
+                strip, pos = read_varint(data, pos)
+                end = data.index(b'\0', pos)
+                name = name[:len(name) - strip] + data[pos:end]
+                pos = end + 1
+            else:
+                end = data.index(b'\0', pos)
+                name = data[pos:end]
+                pos = start + (end - start + 8) // 8 * 8
+
+            if skip_worktree or mode & 0o170000 not in FILE_MODES:
+                continue
+            path = name.decode('UTF-8', 'surrogateescape')
+            if not paths or paths[-1] != path:
+                paths.append(path)
+        return paths
+    except (IOError, OSError, struct.error, ValueError, IndexError):
+        return None
+
+
+def read_varint(data, pos):
+    """Read an offset encoded number, as used by index version 4."""
+    c = data[pos]
+    pos += 1
+    value = c & 0x7f
+    while c & 0x80:
+        c = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (c & 0x7f)
+    return value, pos
+
+
+def list_untracked(work_tree):
+    """Return the untracked files git does not ignore in work_tree."""
+    try:
+        p = subprocess.Popen(
+            ['git', 'ls-files', '--others', '--exclude-standard', '-z'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=work_tree,
+            **popen_options())
+    except OSError:
+        return []
+    try:
+        stdout, stderr = p.communicate(timeout=GIT_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        p.kill()
+        p.communicate()
+        return []
+    if p.returncode != 0:
+        return []
+    return [path for path in stdout.decode('UTF-8', 'surrogateescape')
+            .split('\0') if path]
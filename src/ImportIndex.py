@@ -0,0 +1,118 @@
+"""This file contains the ImportIndex class."""
+import re
+import sublime
+
+QUOTED = r"""['"]([^'"]+)['"]"""
+
+# A line belongs to the import list when it is an import or a global require
+GLOBAL_IMPORT_RE = re.compile(
+    r"^((var|let|const|\s{0,5})\s\w+\s*=\s*)?require\s*\(")
+CONTAINS_IMPORT_RE = re.compile(r"^\s*import\s.*\sfrom\s+" + QUOTED, re.M)
+CONTAINS_REQUIRE_RE = re.compile(r".+?require\s*\(\s*" + QUOTED + r"\s*\)")
+
+IMPORT_RE = re.compile(
+    r"^\s*import\s+(?:([\w$*{}\s,]+?)\s*from\s*)?" + QUOTED, re.M)
+REQUIRE_RE = re.compile(
+    r"(?:(?:var|let|const)\s+(?:([\w$]+)|\{([^}]*)\})\s*=\s*)?"
+    r"require\s*\(\s*" + QUOTED + r"\s*\)")
+RENAME_RE = re.compile(r"\s+as\s+|\s*:\s*")
+TYPE_IMPORT_RE = re.compile(r"^type\s+(?=[\w${*])")
+
+# view id -> ImportIndex
+_indexes = {}
+
+
+def get_import_index(view):
+    """Return the ImportIndex of view, parsed again only after it changed."""
+    change_count = view.change_count()
+    index = _indexes.get(view.id())
+    if index is None or index.change_count != change_count:
+        text = view.substr(sublime.Region(0, view.size()))
+        index = ImportIndex(text, change_count)
+        _indexes[view.id()] = index
+    return index
+
+
+def forget(view_id):
+    """Drop the ImportIndex of a closed view."""
+    _indexes.pop(view_id, None)
+
+
+class ImportIndex():
+
+    """The imports of a buffer, parsed once for every version of its text.
+
+    block_end is the start of the first line after the import list, or None
+    when there is no import list or it runs to the end of the buffer. style
+    is 'es6', 'commonjs' or None when the buffer imports nothing. modules is
+    the set of imported module paths and bindings maps every imported name
+    to the module it comes from.
+    """
+
+    def __init__(self, text, change_count=None):
+        """Constructor for ImportIndex."""
+        self.change_count = change_count
+        self.block_start = None
+        self.block_end = None
+        self.modules = set()
+        self.bindings = {}
+
+        self.style = None
+        if CONTAINS_IMPORT_RE.search(text):
+            self.style = 'es6'
+        elif CONTAINS_REQUIRE_RE.search(text):
+            self.style = 'commonjs'
+
+        self.find_block(text)
+        self.find_imports(text)
+
+    def find_block(self, text):
+        """Find the boundaries of the import list."""
+        pos = 0
+        for line in text.split('\n'):
+            is_global_import = (
+                line.startswith('import') or
+                GLOBAL_IMPORT_RE.match(line)
+            )
+            if is_global_import:
+                if self.block_start is None:
+                    self.block_start = pos
+            elif self.block_start is not None:
+                self.block_end = pos
+                return
+            pos += len(line) + 1
+
+    def find_imports(self, text):
+        """Collect the imported modules and the names they are bound to."""
+        for match in IMPORT_RE.finditer(text):
+            clause, module = match.groups()
+            self.add_import(module, clause)
+
+        for match in REQUIRE_RE.finditer(text):
+            name, destructured, module = match.groups()
+            self.add_import(module, name or destructured)
+
+    def add_import(self, module, clause):
+        self.modules.add(module)
+        if not clause:
+            return
+        clause = TYPE_IMPORT_RE.sub('', clause)
+        for part in clause.replace('{', ',').replace('}', ',').split(','):
+            words = RENAME_RE.split(part.strip())[-1].split()
+            if words and words[-1] != '*':
+                self.bindings[words[-1]] = module
+
+    def get_insertion_point(self, point):
+        """Return where to insert an import for the cursor at point.
+
+        This is the end of the import list when it ends before point, None
+        otherwise.
+        """
+        if self.block_end is not None and self.block_end <= point:
+            return self.block_end
+        return None
+
+    def is_imported(self, module, name=None):
+        """Check if module, or something bound to name, is imported."""
+        return module in self.modules or (name is not None and
+                                          name in self.bindings)
@@ -0,0 +1,225 @@
+"""This file contains the LockFile class."""
+import os
+import re
+import json
+import threading
+
+from . import markers
+from .FormattingProfile import parse_yaml
+
+# Looked up in this order, npm uses a shrinkwrap over its lock file
+LOCK_FILES = ('npm-shrinkwrap.json', 'package-lock.json', 'pnpm-lock.yaml',
+              'yarn.lock')
+markers.register(LOCK_FILES)
+
+# Versions which point to a folder instead of a published package
+LINKED_PREFIXES = ('link:', 'file:', 'portal:', 'workspace:')
+# The peer dependencies pnpm appends to a version, _peer@1 or (peer@1)
+PNPM_PEER_RE = re.compile(r'[_(].*$')
+YARN_VERSION_RE = re.compile(r'^\s+version:?\s+"?([^"\s]+)"?\s*$')
+
+# lock file path -> (mtime, LockFile or None)
+_lock_files = {}
+_lock = threading.Lock()
+
+
+def find_lock_file(folders):
+    """Return the path of the first lock file found in folders, or None."""
+    for folder in folders:
+        found = markers.get_markers(folder)
+        for name in LOCK_FILES:
+            if name in found:
+                return os.path.join(folder, name)
+    return None
+
+
+def get_lock_file(path):
+    """Return the LockFile at path, or None if it can't be read.
+
+    Lock files are parsed once and cached until their mtime changes, which
+    is the only thing checked as long as it does not.
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+
+    with _lock:
+        cached = _lock_files.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    lock_file = None
+    try:
+        lock_file = LockFile(path)
+    except (IOError, OSError, ValueError, UnicodeDecodeError):
+        pass
+
+    with _lock:
+        _lock_files[path] = (mtime, lock_file)
+    return lock_file
+
+
+class LockFile():
+
+    """The packages installed by npm, yarn or pnpm, read from a lock file.
+
+    installed maps every node_modules folder, relative to the folder of
+    the lock file, to a dict of name => version of the packages in it. The
+    version is None when it can't be told from the lock file, e.g. yarn
+    packages installed in several versions. Linked packages are left out.
+    """
+
+    def __init__(self, path):
+        """Constructor for LockFile."""
+        self.path = path
+        self.root = os.path.dirname(path)
+        with open(path, 'r', encoding='UTF-8') as f:
+            text = f.read()
+
+        name = os.path.basename(path)
+        if name == 'pnpm-lock.yaml':
+            self.installed = parse_pnpm_lock(text)
+        elif name == 'yarn.lock':
+            self.installed = parse_yarn_lock(text)
+        else:
+            self.installed = parse_npm_lock(text)
+
+    def get_installed(self, folder):
+        """Return a dict of name => (modules path, version).
+
+        These are the packages that can be required from folder, found in
+        its node_modules or in those of the folders above it up to the
+        folder of the lock file.
+        """
+        rel_path = os.path.relpath(folder, self.root).replace(os.sep, '/')
+        parts = [] if rel_path == os.curdir else rel_path.split('/')
+        if parts and parts[0] == os.pardir:
+            return {}
+
+        installed = {}
+        for i in range(len(parts) + 1):
+            modules_dir = '/'.join(parts[:i] + ['node_modules'])
+            modules_path = os.path.join(self.root, *modules_dir.split('/'))
+            for name, version in self.installed.get(modules_dir, {}).items():
+                installed[name] = (modules_path, version)
+        return installed
+
+
+def is_linked_version(version):
+    return not isinstance(version, str) or version.startswith(LINKED_PREFIXES)
+
+
+def parse_npm_lock(text):
+    """Read a package-lock.json or npm-shrinkwrap.json.
+
+    Lock files from npm 7 on list every installed package in packages,
+    keyed by its path. Older ones only nest the dependencies, where the top
+    level ones are installed in the root node_modules.
+    """
+    lock = json.loads(text)
+    installed = {}
+
+    packages = lock.get('packages')
+    if isinstance(packages, dict):
+        for path, package in packages.items():
+            pos = path.rfind('node_modules/')
+            if pos < 0 or not isinstance(package, dict):
+                continue
+            if package.get('link') or is_linked_version(package.get('version')):
+                continue
+            modules_dir = path[:pos] + 'node_modules'
+            name = path[pos + len('node_modules/'):]
+            installed.setdefault(modules_dir, {})[name] = package['version']
+        return installed
+
+    dependencies = lock.get('dependencies')
+    if isinstance(dependencies, dict):
+        root = installed.setdefault('node_modules', {})
+        for name, package in dependencies.items():
+            if not isinstance(package, dict):
+                continue
+            if not is_linked_version(package.get('version')):
+                root[name] = package['version']
+    return installed
+
+
+def parse_yarn_lock(text):
+    """Read a yarn.lock, of yarn 1 or of yarn 2 and later.
+
+    Entries list the ranges resolved to a version, but not where it is
+    installed. Packages are hoisted to the root node_modules when there is
+    a single version of them, others get a version of None.
+    """
+    versions = {}
+    names = ()
+    for line in text.splitlines():
+        if not line.strip() or line.startswith('#'):
+            continue
+        if not line[0].isspace():
+            names = get_yarn_names(line.rstrip().rstrip(':'))
+            continue
+        m = YARN_VERSION_RE.match(line)
+        if m is None:
+            continue
+        for name in names:
+            versions.setdefault(name, set()).add(m.group(1))
+        names = ()
+
+    root = {}
+    for name, found in versions.items():
+        root[name] = found.pop() if len(found) == 1 else None
+    return {'node_modules': root}
+
+
+def get_yarn_names(descriptors):
+    """Return the package names of a yarn.lock entry, none if it is linked.
+
+    descriptors is the entry's key, like "a@^1.0.0", a@npm:^1.1.0.
+    """
+    names = set()
+    for descriptor in descriptors.split(','):
+        descriptor = descriptor.strip().strip('"')
+        pos = descriptor.find('@', 1)
+        if pos < 0 or descriptor == '__metadata':
+            continue
+        if descriptor[pos + 1:].startswith(LINKED_PREFIXES):
+            return ()
+        names.add(descriptor[:pos])
+    return names
+
+
+def parse_pnpm_lock(text):
+    """Read a pnpm-lock.yaml.
+
+    pnpm only links the direct dependencies of each project into its
+    node_modules, so the packages listed are those of the importers, or
+    of the lock file itself for a single project.
+    """
+    lock = parse_yaml(text)
+    importers = lock.get('importers')
+    if not isinstance(importers, dict):
+        importers = {'.': lock}
+
+    installed = {}
+    for path, importer in importers.items():
+        if not isinstance(importer, dict):
+            continue
+        path = str(path).strip('/')
+        modules_dir = 'node_modules'
+        if path not in ('', '.'):
+            modules_dir = path + '/node_modules'
+        packages = installed.setdefault(modules_dir, {})
+        for dependency_type in ('dependencies', 'devDependencies',
+                                'optionalDependencies'):
+            dependencies = importer.get(dependency_type)
+            if not isinstance(dependencies, dict):
+                continue
+            for name, version in dependencies.items():
+                if isinstance(version, dict):
+                    version = version.get('version')
+                if version is not None:
+                    version = str(version)
+                if not is_linked_version(version):
+                    packages[name] = PNPM_PEER_RE.sub('', version)
+    return installed
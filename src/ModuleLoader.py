@@ -3,12 +3,57 @@ import sublime
 import os
 import re
 import json
+import time
+import functools
 
 from NodeRequirer.src import utils
+from NodeRequirer.src.ProjectIndex import get_index
+from NodeRequirer.src import dependency_cache
+from NodeRequirer.src.FuzzyMatcher import get_matcher
+from NodeRequirer.src import ExportIndex
+from NodeRequirer.src import core_exports
+from NodeRequirer.src import markers
+from NodeRequirer.src.Ranker import Ranker, get_usage_history
+from NodeRequirer.src.Workspace import get_workspace
+from NodeRequirer.src.LockFile import find_lock_file, get_lock_file
+from NodeRequirer.src.GitIndex import get_git_index
 
 HAS_REL_PATH_RE = re.compile(r"\.?\.?\/")
-IS_EXPORT_LINE_COMMONJS = re.compile(r"exports\.(.*?)=")
-IS_EXPORT_LINE_ES6 = re.compile(r"export\s+(var|let|const|function|class)?\s+([^()\[\]{},/*<>%\s-]+)")
+
+# Minimum number of seconds between two background refreshes of an index
+WARM_UP_INTERVAL = 5
+
+# Suffix of the file list entries which browse the files of a dependency
+BROWSE_SUFFIX = '/'
+
+PROJECT_MARKERS = ('package.json', 'bower.json')
+
+
+def find_project_folder(file_name):
+    """Return the closest folder containing a package.json or bower.json."""
+    return markers.find_folder(file_name, PROJECT_MARKERS)
+
+
+def warm_up(file_name):
+    """Load and revalidate the shared index of the project of file_name.
+
+    Meant to be run off the main thread, so that the file list is already in
+    memory when one of the require commands is run.
+    """
+    if not file_name or not find_project_folder(file_name):
+        return
+
+    module_loader = ModuleLoader(file_name)
+    index = module_loader.index
+    with index.lock:
+        if time.time() - index.last_refresh < WARM_UP_INTERVAL:
+            return
+        if index.trees:
+            index.refresh()
+        # Walks any tree that is not part of the index yet, like a newly
+        # added dependency, and indexes the file list for word lookups
+        module_loader.get_matcher()
+        index.last_refresh = time.time()
 
 
 class ModuleLoader():
@@ -19,6 +64,13 @@ class ModuleLoader():
         """Constructor for ModuleLoader."""
         self.file_name = file_name
         self.project_folder = self.get_project_folder()
+        self.workspace = None
+        self.index = None
+        if self.project_folder:
+            # Packages of a workspace share the index of the workspace root
+            self.workspace = get_workspace(self.project_folder)
+            self.index = get_index(self.get_index_root(),
+                                   utils.get_includable_extensions())
 
         # If there is no package.json, show error
         if not self.has_package() and not self.has_bower():
@@ -29,29 +81,29 @@ class ModuleLoader():
 
     def has_package(self):
         """Check if the package.json is in the project directory."""
-        return os.path.exists(
-            os.path.join(self.project_folder, 'package.json')
-        )
+        return 'package.json' in markers.get_markers(self.project_folder)
 
     def has_bower(self):
         """Check if a bower.json is in the project directory."""
-        return os.path.exists(
-            os.path.join(self.project_folder, 'bower.json')
-        )
+        return 'bower.json' in markers.get_markers(self.project_folder)
+
+    def get_index_root(self):
+        """Return the root of the index, the workspace root if any."""
+        if self.workspace is not None:
+            return self.workspace.root
+        return self.project_folder
+
+    def get_index_path(self, path):
+        """Return path relative to the root of the index."""
+        rel_path = os.path.relpath(path, self.get_index_root())
+        return '' if rel_path == os.curdir else rel_path
 
     def get_project_folder(self) -> str:
         """Get the root project folder."""
         # Walk through directories if we didn't find it easily
-        dirname = os.path.dirname(self.file_name)
-        while dirname:
-            pkg = os.path.join(dirname, 'package.json')
-            bwr = os.path.join(dirname, 'bower.json')
-            if os.path.exists(pkg) or os.path.exists(bwr):
-                return dirname
-            parent = os.path.abspath(os.path.join(dirname, os.pardir))
-            if parent == dirname:
-                break
-            dirname = parent
+        project_folder = find_project_folder(self.file_name)
+        if project_folder:
+            return project_folder
 
         try:
             project_data = sublime.active_window().project_data()
@@ -67,52 +119,152 @@ class ModuleLoader():
             'README for more details'
         )
 
-    def get_file_list(self):
-        """Return the list of dependencies and local files."""
-        files = self.get_local_files() + self.get_dependencies()
-        include_patterns = utils.get_includable_extensions()
-
-        def should_include_file(file):
-            return any(file.endswith(p) for p in include_patterns)
+    def get_file_list(self, lazy_dependencies=False):
+        """Return the list of dependencies and local files.
+
+        Local files are listed relative to the project folder, use
+        resolve to get the path to require them by from the current file.
+        With lazy_dependencies, the files inside dependencies are not
+        listed, each dependency gets an entry ending in BROWSE_SUFFIX
+        instead which can be passed to get_browse_list.
+        """
+        files = self.get_modules(lazy_dependencies)
+        if self.file_name:
+            try:
+                files.remove(self.get_project_path(self.file_name))
+            except ValueError:
+                pass
+        return files
 
-        files = [f for f in files if should_include_file(f)]
+    def get_modules(self, lazy_dependencies=False):
+        """Return local files and dependencies, including the current file."""
+        files = self.get_local_files() + self.get_dependencies(
+            lazy_dependencies)
+        if self.index:
+            self.index.save()
         return files
 
     def get_local_files(self):
-        """Load the list of local files."""
+        """Load the list of local files, relative to the project folder.
+
+        The index only holds files with an importable extension and prunes
+        the excluded directories at every level of the project, and with
+        respect_gitignore whatever .gitignore files ignore. The returned list
+        is shared by every file in the project and must not be changed.
+        With local_file_source set to "git", the files are read from the git
+        index instead when the project is in a git repository.
+        """
         # Don't throw errors if invoked in a view without
         # a filename like the console
-        local_files = []
         if not self.file_name:
             return []
 
-        dirname = os.path.dirname(self.file_name)
         exclude = utils.dirs_to_exclude()
-        for root, dirs, files in os.walk(self.project_folder, topdown=True):
-            if os.path.samefile(root, self.project_folder):
-                dirs[:] = [d for d in dirs if d not in exclude]
-
-            for file_name in files:
-                if file_name[0] is not '.':
-                    file_name = "%s/%s" % (root, file_name)
-                    file_name = os.path.relpath(file_name, dirname)
-
-                    if file_name == os.path.basename(self.file_name):
-                        continue
-
-                    if not HAS_REL_PATH_RE.match(file_name):
-                        file_name = "./%s" % file_name
-
-                local_files.append(file_name)
-        return local_files
-
-    def get_dependencies(self):
-        """Load project dependencies."""
+        if utils.get_project_pref('local_file_source') == 'git':
+            files = self.get_git_files(exclude)
+            if files is not None:
+                return files
+        return self.index.walk(self.get_index_path(self.project_folder),
+                               prune=exclude,
+                               gitignore=utils.get_project_pref(
+                                   'respect_gitignore'))
+
+    def get_git_files(self, exclude):
+        """Return the tracked and untracked files of the project, or None.
+
+        Returns None when the project is not in a git repository or its
+        index can't be read.
+        """
+        git_index = get_git_index(self.project_folder)
+        if git_index is None:
+            return None
+        rel_root = os.path.relpath(self.project_folder, git_index.work_tree)
+        if rel_root == os.curdir:
+            rel_root = ''
+        return git_index.get_files(rel_root, self.index.extensions,
+                                   prune=exclude)
+
+    def get_matcher(self):
+        """Return the shared FuzzyMatcher for the project's file list.
+
+        The matcher includes the current file, use find_module to look up
+        modules for it.
+        """
+        return get_matcher(self.project_folder, self.get_modules())
+
+    def find_module(self, word):
+        """Return the module best matching word, or None."""
+        return self.find_modules([word])[word]
+
+    def find_modules(self, words):
+        """Return a dict of word => best matching module or None.
+
+        All words are resolved against the file list at once, without
+        changing it.
+        """
+        exclude = ()
+        if self.file_name:
+            exclude = (self.get_project_path(self.file_name),)
+        ranker = self.get_ranker()
+        return self.get_matcher().best_many(words, exclude, ranker.score)
+
+    def get_ranker(self):
+        """Return a Ranker for modules required from the current file."""
+        current_path = None
+        if self.file_name:
+            current_path = self.get_project_path(self.file_name)
+        return Ranker(get_usage_history(self.project_folder),
+                      self.get_local_files(), current_path)
+
+    def rank_modules(self, modules):
+        """Sort modules by past picks and closeness to the current file."""
+        return self.get_ranker().rank(modules)
+
+    def record_usage(self, modules):
+        """Remember modules were picked, to rank them higher next time.
+
+        modules are entries of the file list, not resolved paths.
+        """
+        sublime.set_timeout_async(functools.partial(
+            get_usage_history(self.project_folder).record, modules), 0)
+
+    def get_project_path(self, path):
+        """Return path relative to the project folder."""
+        return os.path.relpath(path, self.project_folder)
+
+    def resolve(self, module):
+        """Return the path to require module by from the current file.
+
+        Entries of the file list for local files are relative to the project
+        folder, the ./ or ../ form is only rendered for the chosen ones.
+        """
+        if utils.is_core_module(module) or not self.file_name:
+            return module
+
+        path = os.path.join(self.project_folder, module)
+        if not os.path.isfile(path):
+            return module
+
+        module = os.path.relpath(path, os.path.dirname(self.file_name))
+        if not HAS_REL_PATH_RE.match(module):
+            module = "./%s" % module
+        return module
+
+    def get_dependencies(self, lazy=False):
+        """Load project dependencies.
+
+        In a workspace the other packages of the workspace are included,
+        they can be required by name.
+        """
         deps = []
         if self.has_bower():
             deps += self.get_bower_dependencies()
         if self.has_package():
-            deps += self.get_package_dependencies()
+            deps += self.get_package_dependencies(lazy)
+        if self.workspace is not None:
+            deps += [name for name in
+                     self.workspace.get_siblings(self.project_folder)
+                     if name not in deps]
         return deps
 
     def get_bower_dependencies(self):
@@ -125,7 +277,7 @@ class ModuleLoader():
         )
         return self.get_dependencies_with_type(dependency_types, bower)
 
-    def get_package_dependencies(self):
+    def get_package_dependencies(self, lazy=False):
         """Parse the package.json file into a list of dependencies."""
         package = os.path.join(self.project_folder, 'package.json')
         package_json = json.load(open(package, 'r', encoding='UTF-8'))
@@ -137,10 +289,45 @@ class ModuleLoader():
         dependencies = self.get_dependencies_with_type(
             dependency_types, package_json
         )
-        modules_path = os.path.join(self.project_folder, 'node_modules')
-        dep_files = self.get_dependency_files(dependencies, modules_path)
+        installed = self.get_locked_dependencies()
+        if installed and utils.get_project_pref('transitive_dependencies'):
+            dependencies += sorted(set(installed) - set(dependencies))
+        if lazy:
+            return dependencies + [d + BROWSE_SUFFIX for d in dependencies
+                                   if self.is_installed(d)]
+
+        dep_files = self.get_dependency_files(dependencies, installed)
         return dependencies + dep_files
 
+    def get_locked_dependencies(self):
+        """Return the installed packages listed by the project's lock file.
+
+        Returns a dict of name => (modules path, version) as read by
+        LockFile.get_installed, or None when lockfile_dependencies is off or
+        there is no lock file in the project or workspace root.
+        """
+        if not utils.get_project_pref('lockfile_dependencies'):
+            return None
+
+        folders = [self.project_folder]
+        if self.workspace is not None:
+            folders.append(self.workspace.root)
+        path = find_lock_file(folders)
+        lock_file = get_lock_file(path) if path else None
+        if lock_file is None:
+            return None
+        return lock_file.get_installed(self.project_folder)
+
+    def is_browse_entry(self, entry):
+        """Check if a file list entry browses the files of a dependency."""
+        return entry.endswith(BROWSE_SUFFIX)
+
+    def get_browse_list(self, entry):
+        """Return a dependency and its files for a browse entry."""
+        dependency = entry[:-len(BROWSE_SUFFIX)]
+        return [dependency] + self.get_dependency_files(
+            [dependency], self.get_locked_dependencies())
+
     def get_dependencies_with_type(self, dependency_types, json):
         """Common function for adding dependencies (bower or package.json)."""
         dependencies = []
@@ -149,34 +336,68 @@ class ModuleLoader():
                 dependencies += json[dependency_type].keys()
         return dependencies
 
-    def get_dependency_files(self, dependencies, modules_path):
-        """Walk through deps to allow requiring of files in deps package."""
+    def get_modules_path(self, dependency):
+        """Return the node_modules folder dependency is installed in.
+
+        In a workspace, dependencies hoisted to the node_modules of the
+        workspace root are found there.
+        """
+        modules_path = os.path.join(self.project_folder, 'node_modules')
+        if self.workspace is not None:
+            root_modules_path = os.path.join(self.workspace.root,
+                                             'node_modules')
+            if (not os.path.exists(os.path.join(modules_path, dependency)) and
+                    os.path.exists(os.path.join(root_modules_path,
+                                                dependency))):
+                return root_modules_path
+        return modules_path
+
+    def is_installed(self, dependency):
+        """Check if dependency has a folder in node_modules."""
+        return os.path.isdir(os.path.join(self.get_modules_path(dependency),
+                                          dependency))
+
+    def get_dependency_files(self, dependencies, installed=None):
+        """Walk through deps to allow requiring of files in deps package.
+
+        Installed packages are looked up in the dependency cache shared by
+        all projects, only linked packages are walked through the index.
+        installed is the result of get_locked_dependencies, packages found
+        in it are looked up by the version in the lock file without reading
+        node_modules. When the installed package doesn't match the lock
+        file, it is looked up by its own package.json instead.
+        """
         files_to_return = []
 
         for dependency in dependencies:
-            module_path = os.path.join(modules_path, dependency)
-            if not os.path.exists(module_path):
+            dep_files = None
+            locked = (installed or {}).get(dependency, (None, None))
+            if locked[1] is not None:
+                dep_files = dependency_cache.get_locked_files(
+                    dependency, os.path.join(locked[0], dependency),
+                    locked[1], self.index.extensions)
+            if dep_files is None:
+                modules_path = self.get_modules_path(dependency)
+                dep_files = dependency_cache.get_dependency_files(
+                    dependency, os.path.join(modules_path, dependency),
+                    self.index.extensions)
+            if dep_files is not None:
+                files_to_return += dep_files
                 continue
 
-            walk = os.walk(module_path)
-            for root, dirs, files in walk:
-                if 'node_modules' in dirs:
-                    dirs.remove('node_modules')
-                for file_name in files:
-                    basename = os.path.basename(file_name)
-                    normalized_name, extension = utils.splitext(file_name)
-                    if basename == 'index.js':
-                        continue
-                    full_path = os.path.join(root, file_name)
-                    rel_path = os.path.relpath(full_path, module_path)
-                    files_to_return.append(os.path.join(dependency, rel_path))
+            rel_modules_path = self.get_index_path(modules_path)
+            rel_path = os.path.join(rel_modules_path, dependency)
+            for file_name in self.index.walk(rel_path, prune=('node_modules',)):
+                if os.path.basename(file_name) == 'index.js':
+                    continue
+                files_to_return.append(os.path.join(dependency, file_name))
         return files_to_return
 
     def get_exports(self, module):
         """get a given modules exports (commonjs style)."""
         # Module is core module
         if utils.is_core_module(module):
-            return self.get_core_module_exports()
+            return self.get_core_module_exports(module)
         elif utils.is_local_file(module):
             dirname = os.path.dirname(self.file_name)
             path = os.path.join(dirname, module)
@@ -184,37 +405,30 @@ class ModuleLoader():
         else:
             return self.get_dependency_module_exports(module)
 
-    def get_core_module_exports(self):
-        """TODO: get the core module exports."""
-        sublime.error_message(
-            'Parsing node core module exports is not yet '
-            'implemented. Feel free to submit a PR!'
-        )
+    def get_core_module_exports(self, module):
+        """get a core module's exports for the installed version of node."""
+        exports = core_exports.get_exports(module)
+
+        if not exports:
+            return sublime.error_message('Unable to find specific exports.')
+        return exports
 
     def get_dependency_module_exports(self, module):
         """get a deps exports (commonjs)."""
-        base_path = os.path.join(
-            self.project_folder, 'node_modules', module
-        )
-        pkg_path = os.path.join(base_path, 'package.json')
-        package = json.load(open(pkg_path, 'r', encoding='UTF-8'))
-        main = 'index.js' if 'main' not in package else package['main']
-        main_path = os.path.join(base_path, main)
-        return self.get_exports_in_file(main_path)
+        base_path = os.path.join(self.get_modules_path(module), module)
+        if self.workspace is not None and not os.path.exists(base_path):
+            base_path = self.workspace.packages.get(module, base_path)
+        return self.get_exports_in_file(base_path)
 
     def get_exports_in_file(self, fpath):
-        """get exports in a given file (commonjs)."""
-        exports = []
-        if os.path.isdir(fpath):
-            fpath = os.path.join(fpath, 'index.js')
-        f = open(fpath, 'r')
-        for line in f:
-            result = re.search(IS_EXPORT_LINE_COMMONJS, line)
-            if result:
-                exports.append(result.group(1).strip())
-            result = re.search(IS_EXPORT_LINE_ES6, line)
-            if result:
-                exports.append(result.group(2).strip())
+        """get exports in a given file (commonjs).
+
+        fpath is resolved like node does, trying extensions, the main field
+        of package.json and index files. Modules re-exported by the file are
+        followed, exports are cached by each file's path, mtime and size.
+        """
+        fpath = ExportIndex.resolve_path(fpath) or fpath
+        exports = ExportIndex.get_exports(fpath)
 
         if len(exports) <= 0:
             return sublime.error_message('Unable to find specific exports.')
@@ -0,0 +1,488 @@
+"""This file contains the ProjectIndex class."""
+import sublime
+import os
+import json
+import time
+import hashlib
+import threading
+import itertools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import utils
+from .markers import MTIME_RESOLUTION
+from .GitIgnore import (GITIGNORE, get_gitignore, get_parent_gitignores,
+                        is_ignored)
+
+INDEX_VERSION = 3
+
+# Maximum number of threads used to walk the top level sub directories of a
+# tree in parallel
+WALK_WORKERS = 8
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+_poll_token = None
+
+
+def get_cache_dir():
+    """Return the directory NodeRequirer stores its caches in."""
+    return os.path.join(sublime.cache_path(), 'NodeRequirer')
+
+
+def get_index(project_folder, extensions):
+    """Return the shared ProjectIndex for project_folder.
+
+    There is one index per project root for the whole plugin host, so all
+    views, windows and commands in a project share the same walked trees.
+    The index is rebuilt when the importable extensions change.
+    """
+    extensions = tuple(sorted(extensions))
+    with _indexes_lock:
+        index = _indexes.get(project_folder)
+        if index is None or index.extensions != extensions:
+            index = ProjectIndex(project_folder, extensions)
+            _indexes[project_folder] = index
+        return index
+
+
+class ProjectIndex():
+
+    """Persistent, per project index of the files in every walked directory.
+
+    For every directory the index stores its mtime together with the names of
+    the importable files and the sub directories it contains, and whether it
+    has a .gitignore. Adding, removing or renaming an entry updates the mtime
+    of its directory, so revalidating the index only has to stat each
+    directory and list the ones whose mtime changed.
+    """
+
+    def __init__(self, project_folder, extensions):
+        """Constructor for ProjectIndex."""
+        self.project_folder = project_folder
+        self.extensions = tuple(extensions)
+        key = hashlib.md5(project_folder.encode('UTF-8')).hexdigest()
+        self.cache_file = os.path.join(get_cache_dir(), 'index', key + '.json')
+        self.dirs = {}
+        self.trees = {}
+        self.seen = set()
+        self.dirty = False
+        self.last_refresh = 0
+        self.lock = threading.RLock()
+        self.load()
+
+    def load(self):
+        """Load the stored index from the cache directory if it is valid."""
+        try:
+            with open(self.cache_file, 'r', encoding='UTF-8') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+
+        if data.get('version') != INDEX_VERSION:
+            return
+        if data.get('root') != self.project_folder:
+            return
+        if tuple(data.get('extensions', ())) != self.extensions:
+            return
+        self.dirs = data.get('dirs', {})
+
+    def save(self):
+        """Write the index to the cache directory if it changed.
+
+        Holds the lock while writing, so directories patched by another
+        thread don't change the index while it is dumped.
+        """
+        with self.lock:
+            if not self.dirty:
+                return
+
+            data = {
+                'version': INDEX_VERSION,
+                'root': self.project_folder,
+                'extensions': self.extensions,
+                'dirs': self.dirs
+            }
+            tmp_file = self.cache_file + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+                with open(tmp_file, 'w', encoding='UTF-8') as f:
+                    json.dump(data, f, separators=(',', ':'))
+                os.replace(tmp_file, self.cache_file)
+            except (IOError, OSError):
+                return
+            self.dirty = False
+
+    def walk(self, rel_root, exclude=(), prune=(), gitignore=False):
+        """Return the files below rel_root, relative to rel_root.
+
+        Sub directories named in exclude are skipped directly below rel_root,
+        sub directories named in prune are skipped at every level. With
+        gitignore, files and directories ignored by the .gitignore files of
+        the tree and of the folders above it are skipped, ignored directories
+        are not entered. Trees are kept in memory once walked and are only
+        revalidated by refresh or patched by update_paths.
+        """
+        key = (rel_root, frozenset(exclude), frozenset(prune), bool(gitignore))
+        with self.lock:
+            tree = self.trees.get(key)
+            if tree is None:
+                tree = self.walk_tree(key)
+                self.trees[key] = tree
+            return tree.get_files()
+
+    def walk_tree(self, key):
+        """Walk the tree described by a (rel_root, exclude, prune, gitignore) key.
+
+        The top level sub directories are walked on a thread pool, scandir
+        releases the GIL while it waits on the file system.
+        """
+        tree = IndexTree(*key)
+        entry = self.get_entry(tree.rel_root)
+        if entry is None:
+            return tree
+        self.seen.add(tree.rel_root)
+        ignores = self.get_ignores(tree, tree.rel_root, entry)
+        tree.set_files(tree.rel_root, self.filter_ignored(
+            tree.rel_root, entry[1], ignores, False))
+
+        exclude = tree.get_exclude(tree.rel_root)
+        sub_dirs = [os.path.join(tree.rel_root, d) for d in
+                    self.filter_ignored(tree.rel_root, entry[2], ignores, True)
+                    if d not in exclude]
+        if len(sub_dirs) < 2:
+            for sub_dir in sub_dirs:
+                self._walk(tree, sub_dir)
+            return tree
+
+        def walk_sub_dir(sub_dir):
+            sub_tree = IndexTree(*key)
+            sub_tree.ignores[tree.rel_root] = ignores
+            self._walk(sub_tree, sub_dir)
+            return sub_tree
+
+        workers = min(WALK_WORKERS, len(sub_dirs))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for sub_tree in executor.map(walk_sub_dir, sub_dirs):
+                tree.dirs.update(sub_tree.dirs)
+                tree.ignores.update(sub_tree.ignores)
+        tree.files = None
+        return tree
+
+    def refresh(self):
+        """Revalidate every tree walked so far against the file system.
+
+        Directories which are no longer part of any tree are dropped and the
+        index is written back to the cache directory.
+        """
+        with self.lock:
+            self.seen = set()
+            for key in list(self.trees):
+                self.trees[key] = self.walk_tree(key)
+
+            stale = [d for d in self.dirs if d not in self.seen]
+            for rel_dir in stale:
+                del self.dirs[rel_dir]
+            self.dirty = self.dirty or bool(stale)
+            self.save()
+
+    def update_paths(self, paths):
+        """Patch the index after the files or folders at paths changed.
+
+        Only the parent directories of the changed paths are listed again and
+        only their entries in the walked trees are replaced, so the cost is
+        proportional to the number of changed entries, not to the project.
+        Trees honoring .gitignore files are walked again when one changed.
+        """
+        rel_dirs = set()
+        gitignore_changed = False
+        for path in paths:
+            rel_path = os.path.relpath(path, self.project_folder)
+            if rel_path == os.curdir:
+                rel_path = ''
+            elif rel_path.startswith(os.pardir):
+                continue
+            rel_dirs.add(os.path.dirname(rel_path))
+            if rel_path in self.dirs:
+                rel_dirs.add(rel_path)
+            gitignore_changed |= os.path.basename(rel_path) == GITIGNORE
+
+        with self.lock:
+            for rel_dir in sorted(rel_dirs):
+                self.update_dir(rel_dir)
+            if gitignore_changed:
+                for key in list(self.trees):
+                    if key[3]:
+                        self.trees[key] = self.walk_tree(key)
+            self.save()
+
+    def update_dir(self, rel_dir):
+        """List rel_dir again and patch every tree containing it."""
+        trees = [t for t in self.trees.values() if rel_dir in t.dirs]
+        if not trees:
+            return
+
+        old_entry = self.dirs.get(rel_dir)
+        entry = self.get_entry(rel_dir)
+        if entry is old_entry:
+            return
+
+        new_dirs = entry[2] if entry else []
+        removed = []
+        if entry is None:
+            self._collect(rel_dir, old_entry, removed)
+        elif old_entry is not None:
+            for dir_name in old_entry[2]:
+                if dir_name not in new_dirs:
+                    sub_dir = os.path.join(rel_dir, dir_name)
+                    self._collect(sub_dir, self.dirs.get(sub_dir), removed)
+
+        for removed_dir in removed:
+            if self.dirs.pop(removed_dir, None) is not None:
+                self.dirty = True
+
+        for tree in trees:
+            for removed_dir in removed:
+                tree.remove(removed_dir)
+            if entry is None:
+                continue
+
+            ignores = self.get_ignores(tree, rel_dir, entry)
+            tree.set_files(rel_dir, self.filter_ignored(
+                rel_dir, entry[1], ignores, False))
+            exclude = tree.get_exclude(rel_dir)
+            old_dirs = old_entry[2] if old_entry else []
+            for dir_name in self.filter_ignored(rel_dir, new_dirs, ignores,
+                                                True):
+                if dir_name not in old_dirs and dir_name not in exclude:
+                    self._walk(tree, os.path.join(rel_dir, dir_name))
+
+    def _walk(self, tree, rel_dir):
+        entry = self.get_entry(rel_dir)
+        if entry is None:
+            return
+        self.seen.add(rel_dir)
+
+        mtime, file_names, dir_names, has_gitignore = entry
+        ignores = self.get_ignores(tree, rel_dir, entry)
+        tree.set_files(rel_dir, self.filter_ignored(
+            rel_dir, file_names, ignores, False))
+        exclude = tree.get_exclude(rel_dir)
+        for dir_name in self.filter_ignored(rel_dir, dir_names, ignores, True):
+            if dir_name not in exclude:
+                self._walk(tree, os.path.join(rel_dir, dir_name))
+
+    def get_ignores(self, tree, rel_dir, entry):
+        """Return the GitIgnores applying to the entries of rel_dir.
+
+        These are the ones of its parent directory and its own .gitignore.
+        The directories above the tree root are only looked at for the root.
+        """
+        if not tree.gitignore:
+            return ()
+        if rel_dir == tree.rel_root:
+            ignores = self.get_root_ignores(rel_dir)
+        else:
+            ignores = tree.ignores.get(os.path.dirname(rel_dir), ())
+        if entry[3]:
+            gitignore = get_gitignore(
+                os.path.join(self.project_folder, rel_dir, GITIGNORE))
+            if gitignore is not None:
+                ignores += (gitignore,)
+        tree.ignores[rel_dir] = ignores
+        return ignores
+
+    def get_root_ignores(self, rel_root):
+        """Return the GitIgnores of the directories above rel_root."""
+        ignores = get_parent_gitignores(self.project_folder)
+        rel_dir = ''
+        for part in rel_root.split(os.sep) if rel_root else ():
+            entry = self.get_entry(rel_dir)
+            if entry is not None and entry[3]:
+                gitignore = get_gitignore(
+                    os.path.join(self.project_folder, rel_dir, GITIGNORE))
+                if gitignore is not None:
+                    ignores += (gitignore,)
+            rel_dir = os.path.join(rel_dir, part)
+        return ignores
+
+    def filter_ignored(self, rel_dir, names, ignores, is_dir):
+        """Return the names in rel_dir which ignores do not ignore."""
+        if not ignores:
+            return names
+        path = os.path.join(self.project_folder, rel_dir)
+        return [name for name in names if not is_ignored(
+            ignores, os.path.join(path, name), is_dir)]
+
+    def _collect(self, rel_dir, entry, removed):
+        """Collect rel_dir and every directory below it into removed."""
+        removed.append(rel_dir)
+        if entry is None:
+            return
+        for dir_name in entry[2]:
+            sub_dir = os.path.join(rel_dir, dir_name)
+            self._collect(sub_dir, self.dirs.get(sub_dir), removed)
+
+    def get_entry(self, rel_dir):
+        """Return the [mtime, files, dirs, has gitignore] entry for rel_dir.
+
+        The directory is only listed again if its mtime changed since it was
+        stored. Returns None if the directory does not exist.
+        """
+        path = os.path.join(self.project_folder, rel_dir)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            if rel_dir in self.dirs:
+                del self.dirs[rel_dir]
+                self.dirty = True
+            return None
+
+        entry = self.dirs.get(rel_dir)
+        if entry is not None and entry[0] == mtime:
+            return entry
+
+        entry = self.list_dir(path, mtime)
+        self.dirs[rel_dir] = entry
+        self.dirty = True
+        return entry
+
+    def list_dir(self, path, mtime):
+        """List a single directory into an index entry."""
+        file_names, dir_names = list_dir(path, self.extensions)
+        has_gitignore = os.path.isfile(os.path.join(path, GITIGNORE))
+        if time.time() - mtime < MTIME_RESOLUTION:
+            mtime = None
+        return [mtime, file_names, dir_names, has_gitignore]
+
+
+def list_dir(path, extensions):
+    """Return the sorted file and sub directory names of path.
+
+    Only files with one of the given extensions are kept and hidden files
+    are skipped. Like os.walk, symbolic links to directories are not
+    followed.
+    """
+    file_names = []
+    dir_names = []
+    try:
+        for name, is_dir in scan_dir(path):
+            if is_dir:
+                dir_names.append(name)
+            elif (is_dir is False and name[0] != '.' and
+                  name.endswith(extensions)):
+                file_names.append(name)
+    except OSError:
+        pass
+
+    file_names.sort()
+    dir_names.sort()
+    return file_names, dir_names
+
+
+def scan_dir(path):
+    """Yield (name, is_dir) for the entries of path.
+
+    is_dir is None for symbolic links to directories. Uses os.scandir, which
+    gets the entry types from the directory listing itself, when available.
+    """
+    if not hasattr(os, 'scandir'):
+        for name in os.listdir(path):
+            full_path = os.path.join(path, name)
+            if os.path.islink(full_path) and os.path.isdir(full_path):
+                yield name, None
+            else:
+                yield name, os.path.isdir(full_path)
+        return
+
+    for entry in os.scandir(path):
+        if entry.is_dir(follow_symlinks=False):
+            yield entry.name, True
+        elif entry.is_symlink() and entry.is_dir():
+            yield entry.name, None
+        else:
+            yield entry.name, False
+
+
+class IndexTree():
+
+    """Files of a walked tree, grouped by the directory they live in."""
+
+    def __init__(self, rel_root, exclude, prune, gitignore=False):
+        """Constructor for IndexTree."""
+        self.rel_root = rel_root
+        self.exclude = exclude | prune
+        self.prune = prune
+        self.gitignore = gitignore
+        self.dirs = OrderedDict()
+        # directory -> GitIgnores applying to its entries
+        self.ignores = {}
+        self.files = None
+
+    def get_files(self):
+        """Return the flat list of files, relative to the tree root."""
+        if self.files is None:
+            self.files = list(itertools.chain.from_iterable(
+                self.dirs.values()))
+        return self.files
+
+    def get_exclude(self, rel_dir):
+        """Return the names of sub directories to skip in rel_dir."""
+        return self.exclude if rel_dir == self.rel_root else self.prune
+
+    def set_files(self, rel_dir, file_names):
+        """Replace the files the tree holds for rel_dir."""
+        prefix = rel_dir[len(self.rel_root):].lstrip(os.sep)
+        self.dirs[rel_dir] = [os.path.join(prefix, f) for f in file_names]
+        self.files = None
+
+    def remove(self, rel_dir):
+        """Remove the files the tree holds for rel_dir."""
+        self.ignores.pop(rel_dir, None)
+        if self.dirs.pop(rel_dir, None) is not None:
+            self.files = None
+
+
+def update_paths(paths):
+    """Patch every shared index containing one of the changed paths."""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+
+    for index in indexes:
+        root = os.path.join(index.project_folder, '')
+        changed = [p for p in paths if p and p.startswith(root)]
+        if changed:
+            index.update_paths(changed)
+
+
+def start_polling():
+    """Start the background sweep over all shared indexes."""
+    global _poll_token
+    token = _poll_token = object()
+    sublime.set_timeout_async(lambda: poll_indexes(token), 0)
+
+
+def stop_polling():
+    """Stop the background sweep started by start_polling."""
+    global _poll_token
+    _poll_token = None
+
+
+def poll_indexes(token):
+    """Revalidate all shared indexes and schedule the next sweep.
+
+    The sweep only stats directories, which catches changes made outside of
+    Sublime Text like checkouts or build output.
+    """
+    if token is not _poll_token:
+        return
+
+    interval = utils.get_pref('index_poll_interval')
+    if interval:
+        with _indexes_lock:
+            indexes = list(_indexes.values())
+        for index in indexes:
+            index.refresh()
+
+    sublime.set_timeout_async(lambda: poll_indexes(token),
+                              int((interval or 60) * 1000))
@@ -0,0 +1,174 @@
+"""This file contains the Ranker and UsageHistory classes."""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .ProjectIndex import get_cache_dir
+
+HISTORY_VERSION = 1
+# Number of modules remembered per project, least recently used go first
+HISTORY_SIZE = 500
+# Number of seconds after which the weight of a pick is halved
+HALF_LIFE = 14 * 24 * 60 * 60
+
+_histories = {}
+_histories_lock = threading.Lock()
+
+
+def get_usage_history(project_folder):
+    """Return the shared UsageHistory of project_folder."""
+    with _histories_lock:
+        history = _histories.get(project_folder)
+        if history is None:
+            history = UsageHistory(project_folder)
+            _histories[project_folder] = history
+        return history
+
+
+class UsageHistory():
+
+    """Persistent, per project record of the modules picked.
+
+    Every pick adds one to the module's weight, which decays by half every
+    HALF_LIFE seconds. Only the HISTORY_SIZE most recently picked modules
+    are kept.
+    """
+
+    def __init__(self, project_folder):
+        """Constructor for UsageHistory."""
+        self.project_folder = project_folder
+        key = hashlib.md5(project_folder.encode('UTF-8')).hexdigest()
+        self.cache_file = os.path.join(get_cache_dir(), 'usage', key + '.json')
+        # module -> (weight, time of the last pick)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the stored history from the cache directory."""
+        try:
+            with open(self.cache_file, 'r', encoding='UTF-8') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+
+        if data.get('version') != HISTORY_VERSION:
+            return
+        for module, weight, picked in data.get('entries', []):
+            self.entries[module] = (weight, picked)
+
+    def save(self):
+        """Write the history to the cache directory."""
+        with self.lock:
+            data = {
+                'version': HISTORY_VERSION,
+                'entries': [[module, weight, picked] for module, (weight, picked)
+                            in self.entries.items()]
+            }
+        tmp_file = self.cache_file + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            with open(tmp_file, 'w', encoding='UTF-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_file, self.cache_file)
+        except (IOError, OSError):
+            return
+
+    def record(self, modules):
+        """Record a pick of each of modules and save the history."""
+        now = time.time()
+        with self.lock:
+            for module in modules:
+                weight = self.get_weight(module, now) + 1
+                self.entries.pop(module, None)
+                self.entries[module] = (weight, now)
+            while len(self.entries) > HISTORY_SIZE:
+                self.entries.popitem(last=False)
+        self.save()
+
+    def get_weight(self, module, now):
+        """Return the decayed weight of module."""
+        weight, picked = self.entries.get(module, (0, now))
+        return weight * 0.5 ** ((now - picked) / HALF_LIFE)
+
+    def get_weights(self):
+        """Return a dict of module => decayed weight."""
+        now = time.time()
+        with self.lock:
+            return dict((module, self.get_weight(module, now))
+                        for module in self.entries)
+
+
+class Ranker():
+
+    """Scores modules by past picks and by closeness to the current file.
+
+    Scores are between 0 and 1. Half comes from the module's usage weight,
+    the other half from the number of directories between a local file and
+    the current file. Dependencies and core modules count as being in the
+    project root, so only local files closer than that rank above them.
+    """
+
+    def __init__(self, history, local_files=(), current_path=None):
+        """Constructor for Ranker."""
+        self.weights = history.get_weights()
+        self.local_files = get_file_set(local_files)
+        self.current_dir = None
+        if current_path is not None:
+            self.current_dir = split_dir(os.path.dirname(current_path))
+        # directory -> closeness of its files
+        self.closeness = {}
+
+    def score(self, module):
+        """Return the score of module."""
+        usage = 1 - 0.5 ** self.weights.get(module, 0)
+        closeness = 0
+        if self.current_dir is not None:
+            dirname = ''
+            if module in self.local_files:
+                dirname = os.path.dirname(module)
+            closeness = self.get_closeness(dirname)
+        return (usage + closeness) / 2
+
+    def rank(self, modules):
+        """Return modules sorted by score, keeping the order of ties."""
+        return sorted(modules, key=lambda module: -self.score(module))
+
+    def get_closeness(self, dirname):
+        """Return 1 / (1 + directories between dirname and the current)."""
+        closeness = self.closeness.get(dirname)
+        if closeness is None:
+            parts = split_dir(dirname)
+            common = 0
+            for a, b in zip(parts, self.current_dir):
+                if a != b:
+                    break
+                common += 1
+            distance = len(parts) + len(self.current_dir) - 2 * common
+            closeness = 1.0 / (1 + distance)
+            self.closeness[dirname] = closeness
+        return closeness
+
+
+def split_dir(dirname):
+    return [part for part in dirname.replace(os.sep, '/').split('/') if part]
+
+
+_file_set = (None, frozenset())
+
+
+def get_file_set(files):
+    """Return files as a set, reused while the same list is passed.
+
+    The local file lists handed out by the project index are shared and
+    only replaced when they change, so the set is only built again then.
+    """
+    global _file_set
+    cached_files, file_set = _file_set
+    if cached_files is not files:
+        file_set = frozenset(files)
+        _file_set = (files, file_set)
+    return file_set
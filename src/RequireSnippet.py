@@ -1,12 +1,9 @@
 """Contains the RequireSnippet class."""
 import re
-from .utils import get_pref, get_project_pref, get_quotes, should_add_semicolon
-from .utils import get_jscs_options, strip_snippet_groups
-import sublime
-
-quote_block = '("([^"]+)"|\'([^\']+)\')'
-CONTAINS_IMPORT = '^\s*import\s.*\sfrom\s+%s' % quote_block
-CONTAINS_REQUIRE = '.+?require\s*\(\s*%s\s*\)' % quote_block
+from .utils import get_pref, get_project_prefs, get_quotes, should_add_semicolon
+from .utils import strip_snippet_groups
+from .FormattingProfile import FormattingProfile, get_profile
+from .ImportIndex import get_import_index
 
 class RequireSnippet():
 
@@ -21,6 +18,7 @@ class RequireSnippet():
                  destructuring=False):
         """Constructor for RequireSnippet class."""
         self.view = view
+        self.prefs = get_project_prefs(view)
         self.name = name
         self.path = path
         self.should_add_var_name = should_add_var_name
@@ -34,29 +32,19 @@ class RequireSnippet():
         if self.var_type not in ('var', 'const', 'let', 'import'):
             self.var_type = 'var'
         self.file_name = file_name
-        self.jscs_options = dict()
+        self.profile = FormattingProfile()
         if self.file_name:
-            self.jscs_options = get_jscs_options(self.file_name)
+            self.profile = get_profile(self.file_name)
         self.exports = exports
         self.destructuring = destructuring or self.es6import
 
     def detect_import(self):
         """ Helper to determine whether to use es6 or require imports based on file context """
-        if self.contains_match(CONTAINS_IMPORT): self.es6import = True
-        elif self.contains_match(CONTAINS_REQUIRE): self.es6import = False
+        style = get_import_index(self.view).style
+        if style == 'es6': self.es6import = True
+        elif style == 'commonjs': self.es6import = False
         else: self.es6import = self.get_project_pref('detect_prefer_imports')
 
-
-    def contains_match(self, regexp):
-        """
-            Helper to determine whether a regexp is contained in the current file in sublime 3 or sublime 2
-        """
-        # If the regexp is not found, find will return a tuple (-1, -1) in Sublime 3 or None in Sublime 2 
-        # https://github.com/SublimeTextIssues/Core/issues/534
-        contains_import = self.view.find(regexp, 0)
-        return contains_import.size() > 0 if float(sublime.version()) >= 3000 else contains_import is not None
-
-
     def get_formatted_code(self):
         """Return formatted code for insertion."""
         require_fmt = 'require({quote}{path}{quote})'
@@ -127,12 +115,9 @@ class RequireSnippet():
 
     def get_quotes(self):
         """Get type of quotes to use."""
-        # However ignore the 'true' autodetection setting.
-        jscs_quotes = self.jscs_options.get('validateQuoteMarks')
-        if isinstance(jscs_quotes, dict):
-            jscs_quotes = jscs_quotes.get('mark')
-        if jscs_quotes and jscs_quotes is not True:
-            return jscs_quotes
+        # Use the quotes the project's jscs, eslint or prettier config asks for
+        if self.profile.quotes:
+            return self.profile.quotes
 
         # Use whatever quote type is set in preferences
         return get_quotes()
@@ -155,30 +140,17 @@ class RequireSnippet():
                 self.context_allows_semicolon)
 
     def should_strip_setter_whitespace(self):
-        """Parses the disallowSpace{After,Before}BinaryOperators
-        jscs options and checks if spaces are not allowed before or
-        after an `=` so we know if we should strip those from the
-        var statement.
+        """Checks if the project's formatting profile disallows spaces
+        before or after an `=` so we know if we should strip those from
+        the var statement.
         """
-
-        def parse_jscs_option(val):
-            if type(val) == bool:
-                return val
-
-            if isinstance(val, list) and '=' in val:
-                return True
-
-            return False
-
         return dict(
-            before=parse_jscs_option(
-                self.jscs_options.get('disallowSpaceBeforeBinaryOperators')),
-            after=parse_jscs_option(
-                self.jscs_options.get('disallowSpaceAfterBinaryOperators'))
+            before=self.profile.strip_before,
+            after=self.profile.strip_after
         )
 
     def should_use_snippet(self):
         return get_pref('snippet')
 
     def get_project_pref(self, key):
-        return get_project_pref(key, view=self.view)
+        return self.prefs.get(key)
@@ -0,0 +1,152 @@
+"""This file contains the Workspace class."""
+import os
+import json
+import glob
+import fnmatch
+import threading
+
+from . import markers
+from .FormattingProfile import get_stamps, parse_yaml
+
+PNPM_WORKSPACE = 'pnpm-workspace.yaml'
+WORKSPACE_FILES = ('package.json', PNPM_WORKSPACE)
+markers.register(WORKSPACE_FILES)
+
+# folder -> (stamped paths, stamps, Workspace or None)
+_workspaces = {}
+_lock = threading.Lock()
+
+
+def get_workspace(project_folder):
+    """Return the Workspace project_folder is the root or a package of.
+
+    Returns None for projects which are not part of a workspace.
+    """
+    project_folder = os.path.normpath(project_folder)
+    for dirname, found in markers.walk_folders(project_folder):
+        if not found.intersection(WORKSPACE_FILES):
+            continue
+        workspace = load_workspace(dirname)
+        if workspace is not None and workspace.contains(project_folder):
+            return workspace
+    return None
+
+
+def load_workspace(root):
+    """Return the Workspace rooted in root, or None.
+
+    Workspaces are cached until the mtime of the workspace configs or of
+    the folders holding the packages changes.
+    """
+    with _lock:
+        cached = _workspaces.get(root)
+    if cached is not None and get_stamps(cached[0]) == cached[1]:
+        return cached[2]
+
+    config_paths = [os.path.join(root, name) for name in WORKSPACE_FILES]
+    stamps = get_stamps(config_paths)
+    patterns = get_package_patterns(root)
+    workspace = None
+    paths = config_paths
+    if patterns:
+        package_dirs = get_pattern_dirs(root, patterns)
+        stamps += get_stamps(package_dirs)
+        paths = config_paths + package_dirs
+        workspace = Workspace(root, patterns)
+
+    with _lock:
+        _workspaces[root] = (paths, stamps, workspace)
+    return workspace
+
+
+def get_package_patterns(root):
+    """Return the package globs of the workspace rooted in root.
+
+    Reads the packages of pnpm-workspace.yaml, or else the workspaces of
+    package.json, either a list or yarn's {"packages": [...]}.
+    """
+    try:
+        with open(os.path.join(root, PNPM_WORKSPACE), 'r',
+                  encoding='UTF-8') as f:
+            packages = parse_yaml(f.read()).get('packages')
+        if isinstance(packages, list):
+            return [p for p in packages if isinstance(p, str)]
+    except (IOError, OSError, UnicodeDecodeError):
+        pass
+
+    try:
+        with open(os.path.join(root, 'package.json'), 'r',
+                  encoding='UTF-8') as f:
+            workspaces = json.load(f).get('workspaces')
+    except (IOError, OSError, ValueError, AttributeError):
+        return []
+    if isinstance(workspaces, dict):
+        workspaces = workspaces.get('packages')
+    if not isinstance(workspaces, list):
+        return []
+    return [p for p in workspaces if isinstance(p, str)]
+
+
+def get_pattern_dirs(root, patterns):
+    """Return the folders listed to expand patterns, e.g. root/packages."""
+    dirs = set()
+    for pattern in patterns:
+        if pattern.startswith('!'):
+            continue
+        parts = []
+        for part in pattern.split('/'):
+            if glob.has_magic(part):
+                break
+            parts.append(part)
+        dirs.add(os.path.normpath(os.path.join(root, *parts)))
+    return sorted(dirs)
+
+
+class Workspace():
+
+    """A yarn, npm or pnpm workspace, with the packages found in it.
+
+    packages maps the name of every package to its folder. Patterns are
+    expanded one level per wildcard, ** matches a single folder like *.
+    """
+
+    def __init__(self, root, patterns):
+        """Constructor for Workspace."""
+        self.root = root
+        self.include = [p for p in patterns if not p.startswith('!')]
+        self.exclude = [p[1:] for p in patterns if p.startswith('!')]
+        self.packages = self.find_packages()
+
+    def find_packages(self):
+        packages = {}
+        for pattern in self.include:
+            pattern = pattern.rstrip('/').replace('**', '*')
+            for path in sorted(glob.glob(os.path.join(self.root, pattern))):
+                rel_path = os.path.relpath(path, self.root).replace(
+                    os.sep, '/')
+                if any(fnmatch.fnmatch(rel_path, p) for p in self.exclude):
+                    continue
+                name = get_package_name(path)
+                if name is not None:
+                    packages.setdefault(name, os.path.normpath(path))
+        return packages
+
+    def contains(self, folder):
+        """Check if folder is the root or one of the packages."""
+        return folder == self.root or folder in self.packages.values()
+
+    def get_siblings(self, folder):
+        """Return the names of the packages other than the one in folder."""
+        return sorted(name for name, path in self.packages.items()
+                      if path != folder)
+
+
+def get_package_name(path):
+    """Return the name in path/package.json, None if there is none."""
+    try:
+        with open(os.path.join(path, 'package.json'), 'r',
+                  encoding='UTF-8') as f:
+            name = json.load(f).get('name')
+    except (IOError, OSError, ValueError, AttributeError):
+        return None
+    return name if isinstance(name, str) and name else None
@@ -0,0 +1,118 @@
+"""Runs slow work off the main thread and hands the results back to it."""
+import sublime
+import time
+import functools
+import threading
+
+_tasks = {}
+_tasks_lock = threading.Lock()
+
+
+class TaskCancelled(Exception):
+
+    """Raised inside a task that was cancelled or ran past its deadline."""
+
+    pass
+
+
+class Task():
+
+    """Handle passed to the function run by run_async.
+
+    Long running functions should call check between steps, which raises
+    TaskCancelled once the task is superseded or past its deadline.
+    """
+
+    def __init__(self, key, timeout=None):
+        """Constructor for Task."""
+        self.key = key
+        self.deadline = time.time() + timeout if timeout else None
+        self.cancelled = False
+        self.finished = False
+
+    def cancel(self):
+        """Cancel the task, its result will not be delivered."""
+        self.cancelled = True
+
+    def timed_out(self):
+        """Check if the task ran past its deadline."""
+        return self.deadline is not None and time.time() > self.deadline
+
+    def remaining(self, default=None):
+        """Return the number of seconds left until the deadline."""
+        if self.deadline is None:
+            return default
+        return max(self.deadline - time.time(), 0)
+
+    def check(self):
+        """Raise TaskCancelled if the task should stop."""
+        if self.cancelled or self.timed_out():
+            raise TaskCancelled()
+
+
+def run_async(key, func, on_done, timeout=None, on_error=None):
+    """Run func(task) on a worker thread and pass the result to on_done.
+
+    on_done is called on the main thread. Running a new task with the same
+    key cancels the previous one, whose result is then dropped. If the task
+    does not finish within timeout seconds its result is dropped as well
+    and on_error is called with a TaskCancelled error.
+    """
+    task = Task(key, timeout)
+    with _tasks_lock:
+        previous = _tasks.get(key)
+        if previous is not None:
+            previous.cancel()
+        _tasks[key] = task
+
+    on_error = on_error or report_error
+
+    def finish(callback, value):
+        with _tasks_lock:
+            if _tasks.get(key) is task:
+                del _tasks[key]
+        if task.finished or task.cancelled:
+            return
+        task.finished = True
+        callback(value)
+
+    def run():
+        try:
+            result = func(task)
+            task.check()
+        except TaskCancelled as e:
+            if task.timed_out():
+                sublime.set_timeout(functools.partial(finish, on_error, e), 0)
+            return
+        except Exception as e:
+            sublime.set_timeout(functools.partial(finish, on_error, e), 0)
+            return
+        sublime.set_timeout(functools.partial(finish, on_done, result), 0)
+
+    def watchdog():
+        if not task.finished and not task.cancelled:
+            finish(on_error, TaskCancelled('timed out'))
+            task.cancel()
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    if timeout:
+        sublime.set_timeout(watchdog, int(timeout * 1000))
+    return task
+
+
+def cancel(key):
+    """Cancel the running task with the given key, if any."""
+    with _tasks_lock:
+        task = _tasks.pop(key, None)
+    if task is not None:
+        task.cancel()
+
+
+def report_error(error):
+    """Default error handler for run_async."""
+    if isinstance(error, TaskCancelled):
+        sublime.status_message('NodeRequirer: operation timed out')
+    else:
+        sublime.status_message('NodeRequirer: %s' % error)
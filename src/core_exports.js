@@ -0,0 +1,50 @@
+// Lists the core modules of the running node and their exports.
+//
+// Usage: node core_exports.js [version]
+//
+// Prints the major version of node when called with "version", otherwise
+// a JSON object of module name => sorted list of exported names. Modules
+// starting with an underscore, the internal modules old versions of node
+// list and exports starting with an underscore are left out.
+'use strict';
+
+var Module = require('module');
+
+// Requiring deprecated modules must not print warnings to stderr
+process.noDeprecation = true;
+process.removeAllListeners('warning');
+process.on('warning', function () {});
+
+// Modules only available with the node: scheme, absent from builtinModules
+var SCHEME_ONLY = ['node:sea', 'node:sqlite', 'node:test', 'node:test/reporters'];
+
+var major = process.versions.node.split('.')[0];
+
+if (process.argv[2] === 'version') {
+  process.stdout.write(major + '\n');
+  process.exit(0);
+}
+
+var names = Module.builtinModules || Object.keys(process.binding('natives'));
+if (Module.isBuiltin) {
+  names = names.concat(SCHEME_ONLY.filter(function (name) {
+    return names.indexOf(name) === -1 && Module.isBuiltin(name);
+  }));
+}
+var modules = {};
+
+names.filter(function (name) {
+  return name.charAt(0) !== '_' && !/^(internal|node-inspect|v8)\//.test(name);
+}).sort().forEach(function (name) {
+  var exports;
+  try {
+    exports = require(name);
+  } catch (e) {
+    return;
+  }
+  modules[name] = Object.keys(exports || {}).filter(function (key) {
+    return key.charAt(0) !== '_';
+  }).sort();
+});
+
+process.stdout.write(JSON.stringify(modules) + '\n');
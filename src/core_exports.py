@@ -0,0 +1,158 @@
+"""Exports of node's core modules, by major version of node."""
+import os
+import json
+import threading
+
+from . import utils
+from . import modules
+from .node_bridge import node_bridge
+from .ProjectIndex import get_cache_dir
+
+# Generated with core_exports.js from every major version of node we
+# support, shipped so exports are available without running node
+BUNDLED_FILE = os.path.join(os.path.dirname(__file__), 'core_exports.json')
+GENERATOR = os.path.join(os.path.dirname(__file__), 'core_exports.js')
+
+# major version -> {module name: exports}
+_tables = None
+_node_major = None
+_lock = threading.Lock()
+
+
+def get_exports(module):
+    """Return the exports of a core module for the installed node, or None."""
+    table = get_table()
+    exports = table.get(module, table.get(utils.strip_node_scheme(module)))
+    return list(exports) if exports is not None else None
+
+
+def get_core_modules():
+    """Return the names of the core modules of the installed node.
+
+    The names are those of its table of exports, which may run node, so
+    call this off the main thread. Once loaded they are also used by
+    utils.is_core_module. Falls back to the static list of modules.py when
+    no table can be loaded.
+    """
+    table = get_table()
+    if table:
+        modules.set_core_modules(sorted(table))
+    return modules.get_core_modules()
+
+
+def get_table():
+    """Return the {module name: exports} table of the installed node.
+
+    Tables are loaded on first use. When the installed node has a major
+    version no table exists for yet, one is generated by running node once
+    and saved to the cache directory for the following sessions.
+    """
+    global _tables
+    with _lock:
+        if _tables is None:
+            _tables = load_tables()
+
+        major = get_node_major()
+        if major is not None and major not in _tables:
+            table = generate_table()
+            if table is not None:
+                _tables[major] = table
+                save_table(major, table)
+
+        return _tables.get(get_closest_major(_tables, major), {})
+
+
+def get_node_major():
+    """Return the major version of the installed node, once per session."""
+    global _node_major
+    if _node_major is None:
+        try:
+            _node_major = node_bridge('', GENERATOR, ['version'],
+                                      timeout=10).strip()
+        except Exception:
+            _node_major = ''
+    return _node_major or None
+
+
+def get_closest_major(tables, major):
+    """Return the newest version in tables not newer than major."""
+    versions = sorted(tables, key=int)
+    if not versions:
+        return None
+    if major is None:
+        return versions[-1]
+    older = [v for v in versions if int(v) <= int(major)]
+    return older[-1] if older else versions[0]
+
+
+def generate_table():
+    """Run core_exports.js with the installed node, None on failure."""
+    try:
+        return json.loads(node_bridge('', GENERATOR, timeout=30))
+    except Exception:
+        return None
+
+
+def get_cache_file():
+    return os.path.join(get_cache_dir(), 'core_exports.json')
+
+
+def load_tables():
+    """Load the bundled tables, then the ones generated on this machine."""
+    tables = {}
+    for path in (BUNDLED_FILE, get_cache_file()):
+        try:
+            with open(path, 'r', encoding='UTF-8') as f:
+                tables.update(unpack(json.load(f)))
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            pass
+    return tables
+
+
+def save_table(major, table):
+    """Add a generated table to the cache file."""
+    path = get_cache_file()
+    tables = {}
+    try:
+        with open(path, 'r', encoding='UTF-8') as f:
+            tables = unpack(json.load(f))
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        pass
+    tables[major] = table
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp_path, 'w', encoding='UTF-8') as f:
+            json.dump(pack(tables), f, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp_path, path)
+    except (IOError, OSError):
+        pass
+
+
+def pack(tables):
+    """Return tables in their compact form.
+
+    Most modules export the same names across versions, so every distinct
+    list of exports is stored once and tables refer to it by index.
+    """
+    exports = []
+    indexes = {}
+    versions = {}
+    for major, table in tables.items():
+        versions[major] = {}
+        for module, names in table.items():
+            key = tuple(names)
+            if key not in indexes:
+                indexes[key] = len(exports)
+                exports.append(names)
+            versions[major][module] = indexes[key]
+    return {'exports': exports, 'versions': versions}
+
+
+def unpack(data):
+    """Return the tables stored in the compact form created by pack."""
+    exports = data['exports']
+    return dict((major, dict((module, exports[i])
+                             for module, i in table.items()))
+                for major, table in data['versions'].items())
@@ -0,0 +1,170 @@
+"""File lists of installed dependencies, shared by every project."""
+import os
+import json
+import hashlib
+import threading
+
+from .ProjectIndex import get_cache_dir, list_dir
+
+CACHE_VERSION = 1
+
+# package.json path -> (mtime, package key)
+_package_keys = {}
+# cache key -> list of files
+_package_files = {}
+_lock = threading.Lock()
+
+
+def get_dependency_files(dependency, module_path, extensions):
+    """Return the files of an installed dependency, prefixed with its name.
+
+    An installed package does not change for a given name and version, so
+    its file list is stored on disk under that key and shared by all
+    projects on the machine. Returns None for packages which are linked
+    into node_modules, since their contents change without a new version.
+    """
+    package_key = get_package_key(module_path)
+    if package_key is None:
+        return None
+    return get_files(dependency, module_path, package_key, extensions)
+
+
+def get_locked_files(dependency, module_path, version, extensions):
+    """Return the files of a dependency at the version its lock file lists.
+
+    Nothing inside node_modules is read while the file list is cached.
+    Before walking the package, its package.json is checked to hold that
+    name and version, None is returned when it doesn't or the package is
+    linked.
+    """
+    package_key = '%s@%s' % (dependency, version)
+    return get_files(dependency, module_path, package_key, extensions,
+                     verify=True)
+
+
+def get_files(dependency, module_path, package_key, extensions, verify=False):
+    """Return the files of a package from the cache, walking it on a miss.
+
+    With verify, the package is only walked when its package.json matches
+    package_key. The lock is only held to read and store the file lists,
+    so packages are walked in parallel.
+    """
+    key = '%s=%s|%s' % (dependency, package_key, ','.join(sorted(extensions)))
+    with _lock:
+        files = _package_files.get(key)
+    if files is not None:
+        return files
+
+    files = load(key)
+    if files is None:
+        if verify and get_package_key(module_path) != package_key:
+            return None
+        files = walk_package(dependency, module_path, extensions)
+        save(key, files)
+    with _lock:
+        return _package_files.setdefault(key, files)
+
+
+def get_package_key(module_path):
+    """Return the name@version of an installed package, or None.
+
+    The package.json is only read again when its mtime changed. Returns
+    None when there is none or the package is linked.
+    """
+    pkg_path = os.path.join(module_path, 'package.json')
+    try:
+        mtime = os.stat(pkg_path).st_mtime
+    except OSError:
+        return None
+
+    with _lock:
+        cached = _package_keys.get(pkg_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    package_key = read_package_key(module_path, pkg_path)
+    with _lock:
+        _package_keys[pkg_path] = (mtime, package_key)
+    return package_key
+
+
+def read_package_key(module_path, pkg_path):
+    """Read the name@version key from a package.json."""
+    if is_linked(module_path):
+        return None
+
+    try:
+        with open(pkg_path, 'r', encoding='UTF-8') as f:
+            package = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if not isinstance(package, dict) or not package.get('version'):
+        return None
+    return '%s@%s' % (package.get('name'), package['version'])
+
+
+def is_linked(module_path):
+    """Check if a package is linked in from outside of a node_modules folder.
+
+    Packages installed by pnpm are links into node_modules/.pnpm and are
+    still treated as installed packages.
+    """
+    if not os.path.islink(module_path):
+        return False
+    real_path = os.path.realpath(module_path)
+    return 'node_modules' not in real_path.split(os.sep)
+
+
+def walk_package(dependency, module_path, extensions):
+    """Walk an installed package, skipping its own node_modules."""
+    files = []
+    dirs = ['']
+    while dirs:
+        rel_dir = dirs.pop()
+        path = os.path.join(module_path, rel_dir)
+        file_names, dir_names = list_dir(path, extensions)
+        for file_name in file_names:
+            if file_name != 'index.js':
+                files.append(os.path.join(dependency, rel_dir, file_name))
+        for dir_name in reversed(dir_names):
+            if dir_name != 'node_modules':
+                dirs.append(os.path.join(rel_dir, dir_name))
+    return files
+
+
+def get_cache_file(key):
+    """Return the path of the file a package's file list is stored in."""
+    digest = hashlib.md5(key.encode('UTF-8')).hexdigest()
+    return os.path.join(get_cache_dir(), 'dependencies', digest + '.json')
+
+
+def load(key):
+    """Load a stored package file list, or None."""
+    try:
+        with open(get_cache_file(key), 'r', encoding='UTF-8') as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if data.get('version') != CACHE_VERSION or data.get('key') != key:
+        return None
+    return data.get('files')
+
+
+def save(key, files):
+    """Store a package file list in the cache directory."""
+    cache_file = get_cache_file(key)
+    tmp_file = '%s.%s.tmp' % (cache_file, threading.get_ident())
+    data = {
+        'version': CACHE_VERSION,
+        'key': key,
+        'files': files
+    }
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, 'w', encoding='UTF-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_file, cache_file)
+    except (IOError, OSError):
+        pass
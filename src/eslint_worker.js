@@ -0,0 +1,102 @@
+// Long running ESLint process used by NodeRequirer.
+//
+// Usage: node eslint_worker.js <path to eslint package> <project folder>
+//
+// Reads one JSON request per line from stdin:
+//   {"id": 1, "text": "...", "filename": "/path/to/file.js"}
+// and writes one JSON response per line to stdout:
+//   {"id": 1, "messages": [...]} or {"id": 1, "error": "..."}
+'use strict';
+
+var fs = require('fs');
+var path = require('path');
+var readline = require('readline');
+
+var eslint = require(process.argv[2]);
+var cwd = process.argv[3] || process.cwd();
+var engine = null;
+var engineStamp = null;
+
+// Files ESLint reads its configuration from, package.json for eslintConfig
+var CONFIG_FILES = [
+  '.eslintrc', '.eslintrc.js', '.eslintrc.cjs', '.eslintrc.yaml',
+  '.eslintrc.yml', '.eslintrc.json', '.eslintignore', 'package.json',
+  'eslint.config.js', 'eslint.config.mjs', 'eslint.config.cjs',
+  'eslint.config.ts', 'eslint.config.mts', 'eslint.config.cts'
+];
+
+// Returns the paths and mtimes of the config files in the folders above
+// filename, which change when any of them is added, edited or removed.
+function getConfigStamp(filename) {
+  var stamp = [];
+  var dir = path.dirname(path.resolve(cwd, filename || 'file.js'));
+  for (;;) {
+    var names;
+    try {
+      names = fs.readdirSync(dir);
+    } catch (e) {
+      names = [];
+    }
+    names.forEach(function (name) {
+      if (CONFIG_FILES.indexOf(name) === -1) {
+        return;
+      }
+      var file = path.join(dir, name);
+      try {
+        stamp.push(file + ':' + fs.statSync(file).mtime.getTime());
+      } catch (e) {}
+    });
+
+    var parent = path.dirname(dir);
+    if (parent === dir) {
+      return stamp.sort().join('|');
+    }
+    dir = parent;
+  }
+}
+
+function lint(text, filename) {
+  // The engine caches the configs it loaded, so build a new one when any
+  // of the config files changed
+  var stamp = getConfigStamp(filename);
+  if (stamp !== engineStamp) {
+    engine = null;
+    engineStamp = stamp;
+  }
+
+  if (eslint.ESLint) {
+    engine = engine || new eslint.ESLint({ cwd: cwd });
+    return engine.lintText(text, { filePath: filename }).then(function (results) {
+      return results.length ? results[0].messages : [];
+    });
+  }
+
+  engine = engine || new eslint.CLIEngine({ cwd: cwd });
+  return new Promise(function (resolve) {
+    var results = engine.executeOnText(text, filename).results;
+    resolve(results.length ? results[0].messages : []);
+  });
+}
+
+function respond(response) {
+  process.stdout.write(JSON.stringify(response) + '\n');
+}
+
+readline.createInterface({ input: process.stdin }).on('line', function (line) {
+  var request;
+  try {
+    request = JSON.parse(line);
+  } catch (e) {
+    return;
+  }
+
+  Promise.resolve().then(function () {
+    return lint(request.text, request.filename);
+  }).then(function (messages) {
+    respond({ id: request.id, messages: messages });
+  }, function (error) {
+    respond({ id: request.id, error: String(error && error.stack || error) });
+  });
+}).on('close', function () {
+  process.exit(0);
+});
@@ -0,0 +1,106 @@
+"""Finds marker files like package.json in a folder and its parents."""
+import os
+import time
+import threading
+
+# Files looked up by name in the folders above a file. Names passed to
+# find_markers are added to this set.
+MARKERS = set(['package.json', 'bower.json', '.noderequirer.json',
+               '.jscsrc', '.jscs.json'])
+
+# Directory mtimes closer than this to the time they were listed are not
+# trusted, since filesystems with coarse timestamps may not register a
+# change made within the same tick.
+MTIME_RESOLUTION = 2
+CACHE_SIZE = 4096
+
+# folder -> (mtime, generation, frozenset of the markers it contains)
+_folders = {}
+# Incremented when markers are added, invalidating listed folders
+_generation = 0
+_lock = threading.Lock()
+
+
+def register(names):
+    """Make sure names are looked for, dropping folders listed without."""
+    global _generation
+    names = set(names) - MARKERS
+    if names:
+        with _lock:
+            MARKERS.update(names)
+            _folders.clear()
+            _generation += 1
+
+
+def get_markers(dirname):
+    """Return the set of markers in dirname.
+
+    Folders are listed once, both the markers found and the absence of
+    any are cached until the folder's mtime changes.
+    """
+    try:
+        mtime = os.stat(dirname).st_mtime
+    except OSError:
+        return frozenset()
+
+    with _lock:
+        cached = _folders.get(dirname)
+        generation = _generation
+        names = frozenset(MARKERS)
+    if cached is not None and cached[:2] == (mtime, generation):
+        return cached[2]
+
+    try:
+        markers = names.intersection(os.listdir(dirname))
+    except OSError:
+        return frozenset()
+
+    if time.time() - mtime > MTIME_RESOLUTION:
+        with _lock:
+            if len(_folders) >= CACHE_SIZE:
+                _folders.clear()
+            _folders[dirname] = (mtime, generation, markers)
+    return markers
+
+
+def walk_up(path):
+    """Yield (folder, markers) for the folder of path and its parents."""
+    return walk_folders(os.path.dirname(os.path.abspath(path)))
+
+
+def walk_folders(dirname):
+    """Yield (folder, markers) for dirname itself and its parents."""
+    dirname = os.path.abspath(dirname)
+    while True:
+        yield dirname, get_markers(dirname)
+        parent = os.path.dirname(dirname)
+        if parent == dirname:
+            return
+        dirname = parent
+
+
+def find_markers(path, names):
+    """Return a dict of name => path of the nearest file with that name.
+
+    All names are resolved in a single walk up from the folder of path,
+    names that are not found map to None.
+    """
+    register(names)
+    found = dict((name, None) for name in names)
+    missing = set(names)
+    for dirname, markers in walk_up(path):
+        for name in missing.intersection(markers):
+            found[name] = os.path.join(dirname, name)
+            missing.discard(name)
+        if not missing:
+            break
+    return found
+
+
+def find_folder(path, names):
+    """Return the nearest folder containing one of names, or None."""
+    register(names)
+    for dirname, markers in walk_up(path):
+        if markers.intersection(names):
+            return dirname
+    return None
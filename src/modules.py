@@ -1,28 +1,80 @@
+"""Names of node's core modules."""
+
+# Used until the names are read from the table of exports of the installed
+# node, and when no table can be loaded
 core_modules = [
     'assert',
+    'assert/strict',
+    'async_hooks',
     'buffer',
-    'cluster',
     'child_process',
+    'cluster',
+    'console',
+    'constants',
     'crypto',
     'dgram',
+    'diagnostics_channel',
     'dns',
+    'dns/promises',
     'domain',
     'events',
     'fs',
+    'fs/promises',
     'http',
+    'http2',
     'https',
+    'inspector',
+    'inspector/promises',
+    'module',
     'net',
-    'npm',
+    'node:sea',
+    'node:sqlite',
+    'node:test',
+    'node:test/reporters',
     'os',
     'path',
+    'path/posix',
+    'path/win32',
+    'perf_hooks',
+    'process',
     'punycode',
     'querystring',
     'readline',
+    'readline/promises',
+    'repl',
     'stream',
+    'stream/consumers',
+    'stream/promises',
+    'stream/web',
     'string_decoder',
+    'sys',
+    'timers',
+    'timers/promises',
     'tls',
+    'trace_events',
+    'tty',
     'url',
     'util',
+    'util/types',
+    'v8',
     'vm',
+    'wasi',
+    'worker_threads',
     'zlib'
 ]
+
+# Names of the core modules of the installed node, once they were loaded
+_installed_modules = None
+
+
+def get_core_modules():
+    """Return the core modules of the installed node, or the static list."""
+    if _installed_modules is not None:
+        return _installed_modules
+    return core_modules
+
+
+def set_core_modules(names):
+    """Use names as the core modules of the installed node."""
+    global _installed_modules
+    _installed_modules = list(names)
@@ -2,13 +2,19 @@
 # Source: https://github.com/babel/babel-sublime/blob/master/node_bridge.py
 
 import os
+import json
 import platform
 import subprocess
+import threading
 
 IS_OSX = platform.system() == 'Darwin'
 IS_WINDOWS = platform.system() == 'Windows'
 
-def node_bridge(data, bin, args=[]):
+NODE_NOT_FOUND = ('Couldn\'t find Node.js. Make sure it\'s in your $PATH by '
+                  'running `node -v` in your command-line.')
+
+
+def popen_options():
     env = None
     startupinfo = None
     if IS_OSX:
@@ -18,16 +24,185 @@ def node_bridge(data, bin, args=[]):
     if IS_WINDOWS:
         startupinfo = subprocess.STARTUPINFO()
         startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return {'env': env, 'startupinfo': startupinfo}
+
+
+def node_bridge(data, bin, args=[], timeout=None):
     try:
         p = subprocess.Popen(['node', bin] + args,
             stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.PIPE,
-            env=env, startupinfo=startupinfo)
+            **popen_options())
     except OSError:
-        raise Exception('Couldn\'t find Node.js. Make sure it\'s in your $PATH by running `node -v` in your command-line.')
-    stdout, stderr = p.communicate(input=data.encode('utf-8'))
+        raise Exception(NODE_NOT_FOUND)
+    try:
+        stdout, stderr = p.communicate(input=data.encode('utf-8'),
+                                       timeout=timeout)
+    except subprocess.TimeoutExpired:
+        p.kill()
+        p.communicate()
+        raise Exception('Error: node %s timed out' % bin)
     stdout = stdout.decode('utf-8')
     stderr = stderr.decode('utf-8')
     if stderr:
         raise Exception('Error: %s' % stderr)
     else:
         return stdout
+
+
+_workers = {}
+_workers_lock = threading.Lock()
+
+
+def get_worker(bin, args=[], cwd=None, idle_timeout=None):
+    """Return the shared NodeWorker running bin with args."""
+    key = (bin, tuple(args), cwd)
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            worker = NodeWorker(bin, args, cwd)
+            _workers[key] = worker
+        worker.idle_timeout = idle_timeout
+        return worker
+
+
+def stop_workers():
+    """Stop all shared NodeWorkers."""
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.stop()
+
+
+class NodeWorker():
+
+    """A long running node process speaking JSON lines on stdin and stdout.
+
+    Every request is a JSON object written as one line, it gets an "id" the
+    process must copy into the JSON line it responds with. The process is
+    started on the first request, restarted when it exited and stopped
+    after idle_timeout seconds without requests.
+    """
+
+    def __init__(self, bin, args=[], cwd=None):
+        self.bin = bin
+        self.args = list(args)
+        self.cwd = cwd
+        self.idle_timeout = None
+        self.process = None
+        self.pending = {}
+        self.next_id = 0
+        self.idle_timer = None
+        self.lock = threading.Lock()
+
+    def request(self, data, timeout=10):
+        """Send data to the process and return its response.
+
+        Raises an Exception when the process can't be started, exits or
+        doesn't respond within timeout seconds.
+        """
+        with self.lock:
+            process = self.start()
+            self.next_id += 1
+            request_id = self.next_id
+            response = {'event': threading.Event(), 'process': process}
+            self.pending[request_id] = response
+
+            data = dict(data, id=request_id)
+            line = json.dumps(data) + '\n'
+            try:
+                process.stdin.write(line.encode('utf-8'))
+                process.stdin.flush()
+            except (IOError, OSError, ValueError):
+                del self.pending[request_id]
+                self.kill(process)
+                raise Exception('Error: node worker %s exited' % self.bin)
+            self.reset_idle_timer()
+
+        if not response['event'].wait(timeout):
+            with self.lock:
+                self.pending.pop(request_id, None)
+            raise Exception('Error: node worker %s timed out' % self.bin)
+
+        if 'error' in response['data']:
+            raise Exception('Error: %s' % response['data']['error'])
+        return response['data']
+
+    def start(self):
+        """Start the process if it is not running. Requires self.lock."""
+        if self.process is not None and self.process.poll() is None:
+            return self.process
+
+        try:
+            process = subprocess.Popen(
+                ['node', self.bin] + self.args,
+                stdout=subprocess.PIPE, stdin=subprocess.PIPE,
+                stderr=subprocess.PIPE, cwd=self.cwd, **popen_options())
+        except OSError:
+            raise Exception(NODE_NOT_FOUND)
+
+        self.process = process
+        for target in (self.read_stdout, self.read_stderr):
+            thread = threading.Thread(target=target, args=(process,))
+            thread.daemon = True
+            thread.start()
+        return process
+
+    def read_stdout(self, process):
+        """Dispatch the responses of process to the waiting requests."""
+        for line in iter(process.stdout.readline, b''):
+            try:
+                data = json.loads(line.decode('utf-8'))
+            except ValueError:
+                continue
+
+            with self.lock:
+                response = self.pending.pop(data.get('id'), None)
+            if response is not None:
+                response['data'] = data
+                response['event'].set()
+
+        # The process exited, fail the requests still waiting on it
+        with self.lock:
+            if self.process is process:
+                self.process = None
+            failed = [request_id for request_id, response
+                      in self.pending.items()
+                      if response['process'] is process]
+            failed = [self.pending.pop(request_id) for request_id in failed]
+        for response in failed:
+            response['data'] = {'error': 'node worker %s exited' % self.bin}
+            response['event'].set()
+
+    def read_stderr(self, process):
+        """Drain stderr so the process never blocks on a full pipe."""
+        for line in iter(process.stderr.readline, b''):
+            pass
+
+    def reset_idle_timer(self):
+        """Restart the idle shutdown timer. Requires self.lock."""
+        if self.idle_timer is not None:
+            self.idle_timer.cancel()
+            self.idle_timer = None
+        if self.idle_timeout:
+            self.idle_timer = threading.Timer(self.idle_timeout, self.stop)
+            self.idle_timer.daemon = True
+            self.idle_timer.start()
+
+    def stop(self):
+        """Stop the process, it is started again by the next request."""
+        with self.lock:
+            process = self.process
+            self.process = None
+            if self.idle_timer is not None:
+                self.idle_timer.cancel()
+                self.idle_timer = None
+        if process is not None:
+            self.kill(process)
+
+    def kill(self, process):
+        try:
+            process.stdin.close()
+            process.wait(1)
+        except (IOError, OSError, ValueError, subprocess.TimeoutExpired):
+            process.kill()
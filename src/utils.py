@@ -1,16 +1,25 @@
 import sublime
 import os
-import io
 import json
 import re
+import threading
 from io import StringIO
+from collections import OrderedDict
 from difflib import SequenceMatcher
-from .modules import core_modules
+from .modules import get_core_modules
+from .FuzzyMatcher import FuzzyMatcher
+from .FormattingProfile import get_profile
+from . import markers
+from .AliasResolver import AliasResolver
 
 SETTINGS_FILE = "NodeRequirer.sublime-settings"
 
 MERGE_BLACKLIST = ('omit_extensions',)
 
+NODE_SCHEME = 'node:'
+
+LOCAL_FILE_RE = re.compile(r"\.{0,2}[/\\]")
+
 
 def merge_pref(key, old_val, new_val):
     if new_val is None:
@@ -33,30 +42,144 @@ def merge_pref(key, old_val, new_val):
         return new_val
 
 
+# Maximum number of resolved project preference snapshots kept in memory
+PREFS_CACHE_SIZE = 64
+
+_settings = None
+# (file name, window id) -> (watched path, its mtime, ProjectPrefs)
+_view_prefs = OrderedDict()
+# (rc file, rc file mtime, project settings) -> ProjectPrefs
+_project_prefs = OrderedDict()
+_prefs_lock = threading.Lock()
+
+
+def get_settings():
+    """Return the plugin settings, clearing project snapshots on change."""
+    global _settings
+    if _settings is None:
+        settings = sublime.load_settings(SETTINGS_FILE)
+        settings.clear_on_change('NodeRequirer')
+        settings.add_on_change('NodeRequirer', clear_project_prefs)
+        _settings = settings
+    return _settings
+
+
+def clear_project_prefs():
+    """Drop all snapshots, after the settings or project data changed."""
+    with _prefs_lock:
+        _view_prefs.clear()
+        _project_prefs.clear()
+
+
 def get_pref(key):
-    return sublime.load_settings(SETTINGS_FILE).get(key)
+    return get_settings().get(key)
 
 
 def get_project_pref(key, view=None):
-    # Use the user preference
-    val = get_pref(key)
+    return get_project_prefs(view).get(key)
 
-    if view and view.file_name():
-        # Allow project .noderequirerrc files to override preferences
-        rcfile = findup(view.file_name(), '.noderequirer.json')
-        if rcfile:
-            pref = json.load(open(rcfile, 'r', encoding='UTF-8')).get(key)
-            val = merge_pref(key, val, pref)
 
-        # Allow per-project preferences from the project file to override
-        # preferences and project rc settings
-        project_data = view.window().project_data()
-        if project_data:
-            project_settings = project_data.get('NodeRequirer')
-            if project_settings:
-                val = merge_pref(key, val, project_settings.get(key))
+def get_project_prefs(view=None):
+    """Return the ProjectPrefs for the project of the file in view.
 
-    return val
+    The snapshot of a file is checked with a single stat: of its project's
+    .noderequirer.json, or of the project folder when there is none, which
+    changes when one is added. Project data changes clear the snapshots,
+    see clear_project_prefs.
+    """
+    if not view or not view.file_name():
+        return get_snapshot(None, None, {})
+
+    file_name = view.file_name()
+    window = view.window()
+    key = (file_name, window.id() if window else None)
+    with _prefs_lock:
+        cached = _view_prefs.get(key)
+    if cached is not None and get_mtime(cached[0]) == cached[1]:
+        with _prefs_lock:
+            if key in _view_prefs:
+                _view_prefs.move_to_end(key)
+        return cached[2]
+
+    # Allow project .noderequirerrc files to override preferences
+    rcfile = findup(file_name, '.noderequirer.json') or None
+    watched = rcfile or markers.find_folder(
+        file_name, ('package.json', 'bower.json')) or os.path.dirname(
+        file_name)
+    mtime = get_mtime(watched)
+
+    # Allow per-project preferences from the project file to override
+    # preferences and project rc settings
+    project_settings = {}
+    project_data = window.project_data() if window else None
+    if project_data:
+        project_settings = project_data.get('NodeRequirer') or {}
+
+    prefs = get_snapshot(rcfile, mtime if rcfile else None, project_settings)
+    with _prefs_lock:
+        _view_prefs[key] = (watched, mtime, prefs)
+        while len(_view_prefs) > PREFS_CACHE_SIZE:
+            _view_prefs.popitem(last=False)
+    return prefs
+
+
+def get_snapshot(rcfile, rc_mtime, project_settings):
+    """Return the ProjectPrefs shared by files with the same preferences."""
+    key = (rcfile, rc_mtime, json.dumps(project_settings, sort_keys=True))
+    with _prefs_lock:
+        prefs = _project_prefs.get(key)
+    if prefs is not None:
+        return prefs
+
+    rc_prefs = {}
+    if rcfile:
+        with open(rcfile, 'r', encoding='UTF-8') as f:
+            rc_prefs = json.load(f)
+    prefs = ProjectPrefs(rc_prefs, project_settings)
+    with _prefs_lock:
+        prefs = _project_prefs.setdefault(key, prefs)
+        while len(_project_prefs) > PREFS_CACHE_SIZE:
+            _project_prefs.popitem(last=False)
+    return prefs
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class ProjectPrefs():
+
+    """Preferences of a project, each resolved once on first access.
+
+    User preferences are overridden by the project's .noderequirer.json,
+    which is overridden by the NodeRequirer settings of the project data.
+    """
+
+    def __init__(self, rc_prefs, project_settings):
+        """Constructor for ProjectPrefs."""
+        self.layers = (rc_prefs, project_settings)
+        self.values = {}
+        self.alias_resolver = None
+
+    def get(self, key):
+        if key in self.values:
+            return self.values[key]
+
+        val = get_pref(key)
+        for layer in self.layers:
+            val = merge_pref(key, val, layer.get(key))
+        self.values[key] = val
+        return val
+
+    def get_alias_resolver(self):
+        """Return the AliasResolver compiled from these preferences."""
+        if self.alias_resolver is None:
+            self.alias_resolver = AliasResolver(self.get('alias'),
+                                                self.get('alias-pattern'))
+        return self.alias_resolver
 
 
 def get_quotes():
@@ -64,11 +187,18 @@ def get_quotes():
 
 
 def is_core_module(module):
-    return module in core_modules
+    core_modules = get_core_modules()
+    return strip_node_scheme(module) in core_modules or module in core_modules
+
+
+def strip_node_scheme(module):
+    """Strip the node: scheme core modules may be required with."""
+    return module[len(NODE_SCHEME):] if module.startswith(NODE_SCHEME) else module
 
 
 def is_local_file(module):
-    return '/' in module
+    """Check if module is a path, as opposed to a (scoped) package name."""
+    return LOCAL_FILE_RE.match(module) is not None
 
 
 def dirs_to_exclude(view=None):
@@ -85,26 +215,7 @@ def get_includable_extensions(view=None):
 
 
 def aliased(module_path, view=None):
-    aliases = get_project_pref('alias', view=view)
-    alias_patterns = get_project_pref('alias-pattern', view=view)
-
-    # Resolve explicit aliases
-    if module_path in aliases:
-        return aliases[module_path]
-
-    # Resolve regular expression aliases
-    for alias_pattern, result_pattern in alias_patterns.items():
-        m = re.match(alias_pattern, module_path)
-        if m:
-            return m.expand(result_pattern)
-
-    # Allow the alias for package.json in any location to be defined by a
-    # "package.json" alias
-    if os.path.basename(module_path) == 'package.json':
-        if 'package.json' in aliases:
-            return aliases['package.json']
-
-    return None
+    return get_project_prefs(view).get_alias_resolver().resolve(module_path)
 
 
 def strip_snippet_groups(snippet_text):
@@ -156,78 +267,23 @@ def strip_snippet_groups(snippet_text):
     return snippet_text
 
 
-def lazy_parse_comment_json(json_text):
-    """Attempts to parse files like .jscsrc which are .json files with
-    comments in them. This is lazy in that we simply strip things with a
-    regexp and don't take string boundaries into account.
-    This should be fine since it's unlikely that any of the config
-    options we want contain comment-like text
-    """
-
-    if isinstance(json_text, io.IOBase):
-        json_text = json_text.read()
-
-    json_text = re.sub(r'(#|//).*$', '', json_text, re.MULTILINE)
-    json_text = re.sub(r'/\*.*\*/', '', json_text, re.DOTALL)
-    return json.loads(json_text)
-
-
-def get_jscs_options(path):
-    option_sets = []
-
-    jscsrc_path = findup(path, '.jscsrc')
-    if os.path.isfile(jscsrc_path):
-        jscsrc = lazy_parse_comment_json(
-            open(jscsrc_path, 'r', encoding='UTF-8'))
-        option_sets.append((jscsrc_path, jscsrc))
-
-    jscs_json_path = findup(path, '.jscs.json')
-    if os.path.isfile(jscs_json_path):
-        jscs_json = json.load(open(jscs_json_path, 'r', encoding='UTF-8'))
-        option_sets.append((jscs_json_path, jscs_json))
-
-    package_path = findup(path, 'package.json')
-    if os.path.isfile(package_path):
-        package = json.load(open(package_path, 'r', encoding='UTF-8'))
-        if 'jscsConfig' in package:
-            option_sets.append((package_path, package['jscsConfig']))
-
-    # Sort sets by dirname length
-    option_sets.sort(key=lambda x: len(os.path.dirname(x[0])))
-
-    # Merge options together
-    options = dict()
-    for path, option_set in option_sets:
-        options.update(option_set)
-
-    return options
-
-
 def should_add_semicolon(fileName=None):
-    # Ignore semicolons when jscs options say to
-    jscs_options = dict()
+    # Follow the project's jscs, eslint or prettier config when it says so
     if fileName:
-        jscs_options = get_jscs_options(fileName)
-
-    if jscs_options.get('disallowSemicolons', False):
-        return False
+        semicolons = get_profile(fileName).semicolons
+        if semicolons is not None:
+            return semicolons
 
     return not get_pref('semicolon_free')
 
 
 def findup(path, relative_path):
-    path = os.path.abspath(path)
-    # Testing path against dirname(path) should be more reliable than
-    # testing it against '/' and works on Windows where root may be C:/
-    # or something else.
-    while path and path != os.path.dirname(path):
-        test_path = os.path.join(path, relative_path)
-        if os.path.isfile(test_path):
-            return test_path
-
-        path = os.path.dirname(path)
+    """Return the path of the nearest relative_path above path, or False.
 
-    return False
+    Folders are listed once and cached by markers, see find_markers to
+    look for several files in a single walk.
+    """
+    return markers.find_markers(path, (relative_path,))[relative_path] or False
 
 
 def fuzzy_match(first, second):
@@ -235,19 +291,12 @@ def fuzzy_match(first, second):
 
 
 def best_fuzzy_match(s_list, string):
-    best_string = s_list.pop()
-    if string in best_string:
-        return best_string
-    best_ratio = fuzzy_match(best_string, string)
-    for item in s_list:
-        if string in item:
-            return item
-        ratio = fuzzy_match(item, string)
-        if ratio > best_ratio:
-            best_ratio = ratio
-            best_string = item
-
-    return best_string
+    """Return the item of s_list best matching string, or None.
+
+    Builds a FuzzyMatcher for s_list, use FuzzyMatcher.get_matcher to reuse
+    the index for repeated lookups in the same list.
+    """
+    return FuzzyMatcher(s_list).best(string)
 
 def splitext(path):
     """